@@ -0,0 +1,71 @@
+"""dedupe chemical registerIds/takerIds
+
+Revision ID: 8f3c1d2a9b47
+Revises:
+Create Date: 2026-10-18 10:12:36.418205
+
+本迁移是仓库中迁移链的起点（此前的建表迁移不在仓库中）：
+- 已有的线上数据库：alembic_version 中记录的是仓库外的旧版本号，先清空版本表再升级，
+  即 alembic stamp --purge base && alembic upgrade head（本迁移只做可重复执行的数据清理）
+- 全新的空数据库：先用 models.Base.metadata.create_all 建出全部表，再 alembic stamp head
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3c1d2a9b47'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 每批处理的药品行数
+BATCH_SIZE = 500
+
+chemical = sa.table(
+    "chemical",
+    sa.column("id", sa.Integer),
+    sa.column("registerIds", sa.JSON),
+    sa.column("takerIds", sa.JSON),
+)
+
+
+def dedupe(ids):
+    # 保留首次出现的顺序
+    return list(dict.fromkeys(ids)) if ids else ids
+
+
+def upgrade() -> None:
+    # 一次性数据迁移：按主键分批清理历史重复的入库人/领用人
+    connection = op.get_bind()
+    lastId = 0
+    while True:
+        rows = connection.execute(
+            sa.select(chemical.c.id, chemical.c.registerIds, chemical.c.takerIds)
+            .where(chemical.c.id > lastId)
+            .order_by(chemical.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = [
+            {"chemicalId": row.id, "newRegisterIds": dedupe(row.registerIds), "newTakerIds": dedupe(row.takerIds)}
+            for row in rows
+            if dedupe(row.registerIds) != row.registerIds or dedupe(row.takerIds) != row.takerIds
+        ]
+        if updates:
+            connection.execute(
+                chemical.update()
+                .where(chemical.c.id == sa.bindparam("chemicalId"))
+                .values(registerIds=sa.bindparam("newRegisterIds"), takerIds=sa.bindparam("newTakerIds")),
+                updates,
+            )
+        lastId = rows[-1].id
+
+
+def downgrade() -> None:
+    # 去重不可逆，且旧数据中的重复项没有业务含义
+    pass
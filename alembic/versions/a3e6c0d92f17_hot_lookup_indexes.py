@@ -0,0 +1,55 @@
+"""indexes for login/register lookups and list sort columns
+
+Revision ID: a3e6c0d92f17
+Revises: f19b6d8e2c54
+Create Date: 2026-10-18 15:02:17.418263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e6c0d92f17'
+down_revision: Union[str, None] = 'f19b6d8e2c54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_username'), ['username'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_phone'), ['phone'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_email'), ['email'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_workNum'), ['workNum'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_supervisorId'), ['supervisorId'], unique=False)
+        # Text 列只能建前缀索引
+        batch_op.create_index('ix_user_openid', ['openid'], unique=False, mysql_length=64)
+    with op.batch_alter_table('user_unchecked', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_unchecked_username'), ['username'], unique=False)
+    with op.batch_alter_table('chemical', schema=None) as batch_op:
+        batch_op.create_index('ix_chemical_formula', ['formula'], unique=False, mysql_length=64)
+    with op.batch_alter_table('equipment', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_equipment_name'), ['name'], unique=False)
+    with op.batch_alter_table('log', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_log_time'), ['time'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('log', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_log_time'))
+    with op.batch_alter_table('equipment', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_equipment_name'))
+    with op.batch_alter_table('chemical', schema=None) as batch_op:
+        batch_op.drop_index('ix_chemical_formula')
+    with op.batch_alter_table('user_unchecked', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_unchecked_username'))
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_openid')
+        batch_op.drop_index(batch_op.f('ix_user_supervisorId'))
+        batch_op.drop_index(batch_op.f('ix_user_workNum'))
+        batch_op.drop_index(batch_op.f('ix_user_email'))
+        batch_op.drop_index(batch_op.f('ix_user_phone'))
+        batch_op.drop_index(batch_op.f('ix_user_username'))
@@ -0,0 +1,143 @@
+"""chemical_taker/chemical_register tables replace JSON id lists
+
+Revision ID: b61e4f0c7a38
+Revises: 8f3c1d2a9b47
+Create Date: 2026-10-18 11:04:52.730164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b61e4f0c7a38'
+down_revision: Union[str, None] = '8f3c1d2a9b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 每批处理的药品行数
+BATCH_SIZE = 500
+
+chemical = sa.table(
+    "chemical",
+    sa.column("id", sa.Integer),
+    sa.column("registerIds", sa.JSON),
+    sa.column("takerIds", sa.JSON),
+)
+user = sa.table(
+    "user",
+    sa.column("id", sa.Integer),
+    sa.column("takingChemicalAmount", sa.Integer),
+)
+chemicalRegister = sa.table(
+    "chemical_register",
+    sa.column("chemicalId", sa.Integer),
+    sa.column("userId", sa.Integer),
+)
+chemicalTaker = sa.table(
+    "chemical_taker",
+    sa.column("chemicalId", sa.Integer),
+    sa.column("userId", sa.Integer),
+    sa.column("amount", sa.Float),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chemical_register',
+        sa.Column('chemicalId', sa.Integer(), nullable=False),
+        sa.Column('userId', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['chemicalId'], ['chemical.id'], name=op.f('fk_chemical_register_chemicalId_chemical'),
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['userId'], ['user.id'], name=op.f('fk_chemical_register_userId_user')),
+        sa.PrimaryKeyConstraint('chemicalId', 'userId', name=op.f('pk_chemical_register'))
+    )
+    op.create_index(op.f('ix_chemical_register_userId'), 'chemical_register', ['userId'], unique=False)
+    op.create_table(
+        'chemical_taker',
+        sa.Column('chemicalId', sa.Integer(), nullable=False),
+        sa.Column('userId', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['chemicalId'], ['chemical.id'], name=op.f('fk_chemical_taker_chemicalId_chemical'),
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['userId'], ['user.id'], name=op.f('fk_chemical_taker_userId_user')),
+        sa.PrimaryKeyConstraint('chemicalId', 'userId', name=op.f('pk_chemical_taker'))
+    )
+    op.create_index(op.f('ix_chemical_taker_userId'), 'chemical_taker', ['userId'], unique=False)
+
+    connection = op.get_bind()
+    userIds = set(connection.execute(sa.select(user.c.id)).scalars())
+    # 旧数据中领用量记在用户上（一人一个值），只有领用了一种药品的用户才能确定其归属
+    takenCounts = {}
+    lastId = 0
+    while True:
+        rows = connection.execute(
+            sa.select(chemical.c.id, chemical.c.registerIds, chemical.c.takerIds)
+            .where(chemical.c.id > lastId)
+            .order_by(chemical.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        registers, takers = [], []
+        for row in rows:
+            for userId in dict.fromkeys(row.registerIds or []):
+                if userId in userIds:
+                    registers.append({"chemicalId": row.id, "userId": userId})
+            for userId in dict.fromkeys(row.takerIds or []):
+                if userId in userIds:
+                    takers.append({"chemicalId": row.id, "userId": userId, "amount": 0})
+                    takenCounts[userId] = takenCounts.get(userId, 0) + 1
+        if registers:
+            connection.execute(chemicalRegister.insert(), registers)
+        if takers:
+            connection.execute(chemicalTaker.insert(), takers)
+        lastId = rows[-1].id
+    singleTakers = [userId for userId, count in takenCounts.items() if count == 1]
+    for takingChemicalAmount, userId in connection.execute(
+            sa.select(user.c.takingChemicalAmount, user.c.id).where(user.c.id.in_(singleTakers))).all():
+        connection.execute(
+            chemicalTaker.update()
+            .where(chemicalTaker.c.userId == userId)
+            .values(amount=takingChemicalAmount or 0)
+        )
+
+    with op.batch_alter_table('chemical', schema=None) as batch_op:
+        batch_op.drop_column('registerIds')
+        batch_op.drop_column('takerIds')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('takingChemicalAmount')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('takingChemicalAmount', sa.Integer(), nullable=True))
+    with op.batch_alter_table('chemical', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('takerIds', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('registerIds', sa.JSON(), nullable=True))
+
+    connection = op.get_bind()
+    registerIds, takerIds, takenAmounts = {}, {}, {}
+    for chemicalId, userId in connection.execute(sa.select(chemicalRegister.c.chemicalId, chemicalRegister.c.userId)):
+        registerIds.setdefault(chemicalId, []).append(userId)
+    for chemicalId, userId, amount in connection.execute(
+            sa.select(chemicalTaker.c.chemicalId, chemicalTaker.c.userId, chemicalTaker.c.amount)):
+        takerIds.setdefault(chemicalId, []).append(userId)
+        takenAmounts[userId] = takenAmounts.get(userId, 0) + amount
+    for chemicalId in connection.execute(sa.select(chemical.c.id)).scalars().all():
+        connection.execute(
+            chemical.update()
+            .where(chemical.c.id == chemicalId)
+            .values(registerIds=registerIds.get(chemicalId, []), takerIds=takerIds.get(chemicalId, []))
+        )
+    for userId, amount in takenAmounts.items():
+        connection.execute(user.update().where(user.c.id == userId).values(takingChemicalAmount=int(amount)))
+    with op.batch_alter_table('chemical', schema=None) as batch_op:
+        batch_op.alter_column('registerIds', existing_type=sa.JSON(), nullable=False)
+
+    op.drop_index(op.f('ix_chemical_taker_userId'), table_name='chemical_taker')
+    op.drop_table('chemical_taker')
+    op.drop_index(op.f('ix_chemical_register_userId'), table_name='chemical_register')
+    op.drop_table('chemical_register')
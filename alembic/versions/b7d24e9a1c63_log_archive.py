@@ -0,0 +1,50 @@
+"""log_archive table for audit logs moved out of the hot log table
+
+Revision ID: b7d24e9a1c63
+Revises: a3e6c0d92f17
+Create Date: 2026-10-18 16:11:40.205871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d24e9a1c63'
+down_revision: Union[str, None] = 'a3e6c0d92f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'log_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('operatorId', sa.Integer(), nullable=False),
+        sa.Column('operation', sa.Text(), nullable=True),
+        sa.Column('time', sa.DateTime(), nullable=True),
+        sa.Column('action', sa.Integer(), nullable=True),
+        sa.Column('entityType', sa.Integer(), nullable=True),
+        sa.Column('entityId', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_log_archive')),
+        mysql_row_format='COMPRESSED'
+    )
+    op.create_index(op.f('ix_log_archive_time'), 'log_archive', ['time'], unique=False)
+    op.create_index('ix_log_archive_entityType_time', 'log_archive', ['entityType', 'time'], unique=False)
+    op.create_index('ix_log_archive_operatorId_time', 'log_archive', ['operatorId', 'time'], unique=False)
+    # 已有的历史日志由 python -m logArchive.main 移入归档表
+
+
+def downgrade() -> None:
+    # 归档的日志先移回热表
+    columns = ["id", "operatorId", "operation", "time", "action", "entityType", "entityId", "quantity"]
+    log = sa.table("log", *[sa.column(name) for name in columns])
+    logArchive = sa.table("log_archive", *[sa.column(name) for name in columns])
+    op.execute(log.insert().from_select(columns, sa.select(*[logArchive.c[name] for name in columns])))
+    op.drop_index('ix_log_archive_operatorId_time', table_name='log_archive')
+    op.drop_index('ix_log_archive_entityType_time', table_name='log_archive')
+    op.drop_index(op.f('ix_log_archive_time'), table_name='log_archive')
+    op.drop_table('log_archive')
@@ -0,0 +1,63 @@
+"""stat_counter table
+
+Revision ID: c2d8a5f13e96
+Revises: b61e4f0c7a38
+Create Date: 2026-10-18 11:52:07.215843
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d8a5f13e96'
+down_revision: Union[str, None] = 'b61e4f0c7a38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+chemical = sa.table(
+    'chemical',
+    sa.column('type', sa.Integer),
+    sa.column('dangerLevel', sa.JSON)
+)
+equipment = sa.table(
+    'equipment',
+    sa.column('status', sa.Integer)
+)
+# 与 models.COUNTERS 中的分类一致：(表, 分类, 条件)
+CATEGORIES = [
+    (chemical, 'all', sa.true()),
+    (chemical, 'type:1', chemical.c.type == 1),
+    # 易制毒制爆（危险等级为一位数字，与 getChemicals 的筛选相同按 JSON 文本匹配）
+    (chemical, 'dangerous', sa.or_(chemical.c.dangerLevel.contains(5), chemical.c.dangerLevel.contains(6))),
+    (equipment, 'all', sa.true()),
+] + [(equipment, f'status:{status}', equipment.c.status == status) for status in (1, 2, 3, 4)]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stat_counter',
+        sa.Column('tableName', sa.String(length=30), nullable=False),
+        sa.Column('category', sa.String(length=30), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('tableName', 'category', name=op.f('pk_stat_counter'))
+    )
+    # 在迁移中初始化全部计数行（计数为 0 的分类也有一行），请求中只读取与增减
+    statCounter = sa.table(
+        'stat_counter',
+        sa.column('tableName', sa.String),
+        sa.column('category', sa.String),
+        sa.column('value', sa.Integer)
+    )
+    for table, category, condition in CATEGORIES:
+        op.execute(statCounter.insert().from_select(
+            ['tableName', 'category', 'value'],
+            sa.select(sa.literal(table.name), sa.literal(category), sa.func.count()).select_from(table).where(condition)
+        ))
+
+
+def downgrade() -> None:
+    op.drop_table('stat_counter')
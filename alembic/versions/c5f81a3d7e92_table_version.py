@@ -0,0 +1,35 @@
+"""table_version for conditional list responses
+
+Revision ID: c5f81a3d7e92
+Revises: b7d24e9a1c63
+Create Date: 2026-10-18 17:26:08.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f81a3d7e92'
+down_revision: Union[str, None] = 'b7d24e9a1c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 与 models.VERSIONED_TABLES 保持一致
+TABLE_NAMES = ("notice", "chemical", "equipment", "group_meeting")
+
+
+def upgrade() -> None:
+    tableVersion = op.create_table(
+        'table_version',
+        sa.Column('tableName', sa.String(length=30), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('tableName', name=op.f('pk_table_version'))
+    )
+    op.bulk_insert(tableVersion, [{"tableName": tableName, "version": 1} for tableName in TABLE_NAMES])
+
+
+def downgrade() -> None:
+    op.drop_table('table_version')
@@ -0,0 +1,31 @@
+"""table_version rows for users and directions
+
+Revision ID: d3b96e58a0c4
+Revises: c5f81a3d7e92
+Create Date: 2026-10-19 10:12:44.207315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3b96e58a0c4'
+down_revision: Union[str, None] = 'c5f81a3d7e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 导师姓名、研究方向列表的响应缓存按这两个版本号判断是否失效
+TABLE_NAMES = ("user", "direction")
+
+tableVersion = sa.table('table_version', sa.column('tableName', sa.String), sa.column('version', sa.Integer))
+
+
+def upgrade() -> None:
+    op.bulk_insert(tableVersion, [{"tableName": tableName, "version": 1} for tableName in TABLE_NAMES])
+
+
+def downgrade() -> None:
+    op.execute(tableVersion.delete().where(tableVersion.c.tableName.in_(TABLE_NAMES)))
@@ -0,0 +1,36 @@
+"""search_token inverted index
+
+Revision ID: d47f9e2b6a10
+Revises: c2d8a5f13e96
+Create Date: 2026-10-18 12:40:19.583021
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd47f9e2b6a10'
+down_revision: Union[str, None] = 'c2d8a5f13e96'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 建表后执行 python -m searchIndexRebuild.main 填充索引
+    op.create_table(
+        'search_token',
+        sa.Column('entityType', sa.String(length=20), nullable=False),
+        sa.Column('token', sa.String(length=60), nullable=False),
+        sa.Column('entityId', sa.Integer(), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('entityType', 'token', 'entityId', name=op.f('pk_search_token'))
+    )
+    op.create_index(op.f('ix_search_token_entityId'), 'search_token', ['entityId'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_search_token_entityId'), table_name='search_token')
+    op.drop_table('search_token')
@@ -0,0 +1,27 @@
+"""accomplishment.date index for year range filters
+
+Revision ID: e85a3c7d4f21
+Revises: d47f9e2b6a10
+Create Date: 2026-10-18 13:22:45.906112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e85a3c7d4f21'
+down_revision: Union[str, None] = 'd47f9e2b6a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 成果的搜索索引需执行 python -m searchIndexRebuild.main accomplishment 填充
+    op.create_index(op.f('ix_accomplishment_date'), 'accomplishment', ['date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_accomplishment_date'), table_name='accomplishment')
@@ -0,0 +1,138 @@
+"""structured log columns: action/entityType/entityId/quantity
+
+Revision ID: f19b6d8e2c54
+Revises: e85a3c7d4f21
+Create Date: 2026-10-18 14:08:31.662470
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19b6d8e2c54'
+down_revision: Union[str, None] = 'e85a3c7d4f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 每批处理的日志行数
+BATCH_SIZE = 1000
+
+# 与 models.LogAction / models.LogEntity 保持一致（迁移不依赖模型代码）
+ADD, DELETE, MODIFY, TAKE, RETURN, SUPPLEMENT, LOGIN, EXPORT, APPROVE, REJECT, RESET_PASSWORD = range(1, 12)
+CHEMICAL, EQUIPMENT, ACCOMPLISHMENT, MEETING, NOTICE, USER = range(1, 7)
+
+# 历史描述文本 -> (动作, 对象类型, 对象名称所在分组, 数量所在分组)
+PATTERNS = [
+    (re.compile(r"^入库药品：(.+)$"), ADD, CHEMICAL, 1, None),
+    (re.compile(r"^删除药品：(.+)$"), DELETE, CHEMICAL, 1, None),
+    (re.compile(r"^领用药品：(.+) ([\d.]+)瓶$"), TAKE, CHEMICAL, 1, 2),
+    (re.compile(r"^归还药品：(.+)$"), RETURN, CHEMICAL, 1, None),
+    (re.compile(r"^补充药品：(.+) ([\d.]+)瓶$"), SUPPLEMENT, CHEMICAL, 1, 2),
+    (re.compile(r"^修改药品信息：(.+)$"), MODIFY, CHEMICAL, 1, None),
+    (re.compile(r"^入库设备：(.+)$"), ADD, EQUIPMENT, 1, None),
+    (re.compile(r"^修改设备信息：(.+)$"), MODIFY, EQUIPMENT, 1, None),
+    (re.compile(r"^删除设备：(.+)$"), DELETE, EQUIPMENT, 1, None),
+    (re.compile(r"^添加研究成果：(.+)$"), ADD, ACCOMPLISHMENT, 1, None),
+    (re.compile(r"^删除研究成果：(.+)$"), DELETE, ACCOMPLISHMENT, 1, None),
+    (re.compile(r"^导出研究成果$"), EXPORT, ACCOMPLISHMENT, None, None),
+    (re.compile(r"^添加组会安排$"), ADD, MEETING, None, None),
+    (re.compile(r"^删除组会安排$"), DELETE, MEETING, None, None),
+    (re.compile(r"^发布通知公告$"), ADD, NOTICE, None, None),
+    (re.compile(r"^删除通知公告$"), DELETE, NOTICE, None, None),
+    (re.compile(r"^用户登录"), LOGIN, USER, None, None),
+    (re.compile(r"^同意用户「(.+)」注册$"), APPROVE, USER, 1, None),
+    (re.compile(r"^拒绝用户「(.+)」注册$"), REJECT, USER, None, None),
+    (re.compile(r"^用户重置密码$"), RESET_PASSWORD, USER, None, None),
+    (re.compile(r"^修改用户信息$"), MODIFY, USER, None, None),
+]
+# 对自身的操作：对象id即操作人
+SELF_ACTIONS = {LOGIN, RESET_PASSWORD}
+
+log = sa.table(
+    "log",
+    sa.column("id", sa.Integer),
+    sa.column("operatorId", sa.Integer),
+    sa.column("operation", sa.Text),
+    sa.column("action", sa.Integer),
+    sa.column("entityType", sa.Integer),
+    sa.column("entityId", sa.Integer),
+    sa.column("quantity", sa.Float),
+)
+
+
+def uniqueNames(connection, tableName, nameColumn):
+    """名称 -> id，只保留唯一的名称（重名时无法确定对象）"""
+    table = sa.table(tableName, sa.column("id", sa.Integer), sa.column(nameColumn, sa.String))
+    ids = {}
+    for entityId, name in connection.execute(sa.select(table.c.id, table.c[nameColumn])):
+        ids[name] = None if name in ids else entityId
+    return {name: entityId for name, entityId in ids.items() if entityId is not None}
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('action', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('entityType', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('entityId', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('quantity', sa.Float(), nullable=True))
+        batch_op.create_index('ix_log_entityType_time', ['entityType', 'time'], unique=False)
+        batch_op.create_index('ix_log_operatorId_time', ['operatorId', 'time'], unique=False)
+
+    # 解析历史日志的描述文本回填结构化列；删除类操作的对象已不存在，id留空
+    connection = op.get_bind()
+    names = {
+        CHEMICAL: uniqueNames(connection, "chemical", "name"),
+        EQUIPMENT: uniqueNames(connection, "equipment", "name"),
+        ACCOMPLISHMENT: uniqueNames(connection, "accomplishment", "title"),
+        USER: uniqueNames(connection, "user", "username"),
+    }
+    lastId = 0
+    while True:
+        rows = connection.execute(
+            sa.select(log.c.id, log.c.operatorId, log.c.operation)
+            .where(log.c.id > lastId)
+            .order_by(log.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            for pattern, action, entityType, nameGroup, quantityGroup in PATTERNS:
+                match = pattern.match(row.operation or "")
+                if not match:
+                    continue
+                entityId = None
+                if action in SELF_ACTIONS or (action == MODIFY and entityType == USER):
+                    entityId = row.operatorId
+                elif nameGroup and action != DELETE:
+                    entityId = names[entityType].get(match.group(nameGroup))
+                quantity = float(match.group(quantityGroup)) if quantityGroup else None
+                updates.append({"logId": row.id, "newAction": action, "newEntityType": entityType,
+                                "newEntityId": entityId, "newQuantity": quantity})
+                break
+        if updates:
+            connection.execute(
+                log.update().where(log.c.id == sa.bindparam("logId")).values(
+                    action=sa.bindparam("newAction"),
+                    entityType=sa.bindparam("newEntityType"),
+                    entityId=sa.bindparam("newEntityId"),
+                    quantity=sa.bindparam("newQuantity"),
+                ),
+                updates,
+            )
+        lastId = rows[-1].id
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('log', schema=None) as batch_op:
+        batch_op.drop_index('ix_log_operatorId_time')
+        batch_op.drop_index('ix_log_entityType_time')
+        batch_op.drop_column('quantity')
+        batch_op.drop_column('entityId')
+        batch_op.drop_column('entityType')
+        batch_op.drop_column('action')
@@ -9,8 +9,11 @@ from bluePrints.equipment import equipmentRouter
 from bluePrints.extras import extrasRouter
 from bluePrints.groupMeeting import meetingRouter
 from bluePrints.accomplishment import accompRouter
+from bluePrints.batch import batchRouter
 from bluePrints.user import userRouter
 from bluePrints.socketRouter import socketRouter
+from utils.auditLog import auditLog
+from utils.wxClient import wxClient
 
 current_file_path = pathlib.Path(__file__).parent.resolve()
 JINJA_TEMPLATE = JinjaTemplate(os.path.join(current_file_path, "templates"))
@@ -25,9 +28,19 @@ app.include_router(equipmentRouter)
 app.include_router(meetingRouter)
 app.include_router(accompRouter)
 app.include_router(extrasRouter)
+app.include_router(batchRouter)
 app.include_router(socketRouter)
 
 
+# 进程退出时写入缓冲的审计日志，关闭连接池等资源
+async def onShutdown():
+    await auditLog.flush()
+    await wxClient.close()
+
+
+app.shutdown_handler(onShutdown)
+
+
 @app.get("/")
 async def index():
     return JINJA_TEMPLATE.render_template("index.html")
@@ -0,0 +1,66 @@
+"""
+同步会话与异步会话的并发吞吐对比：CONCURRENCY 个并发请求，每个请求在独立的请求级会话中执行一次公告列表查询；
+同步会话在等待数据库时阻塞事件循环（请求实际串行执行），异步会话等待时可切换到其他请求
+MySQL 上另测一条 SLEEP 5ms 的慢查询，体现一条慢查询对同一进程中其他请求的影响
+用法：在项目根目录执行 python -m asyncBenchmark.main [并发数] [总请求数]，只执行只读查询
+"""
+import asyncio
+import sys
+import time
+
+from sqlalchemy import select, text
+
+from models import engine, asyncEngine, session, asyncSession, Notice
+from utils.router import scopedSession
+
+SLOW_QUERY = text("SELECT SLEEP(0.005)")
+
+
+def syncRequest(statement):
+    @scopedSession
+    async def handler():
+        session.execute(statement).all()
+
+    return handler
+
+
+def asyncRequest(statement):
+    @scopedSession
+    async def handler():
+        (await asyncSession.execute(statement)).all()
+
+    return handler
+
+
+# 每秒完成的请求数
+async def throughput(handler, concurrency, total):
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await handler()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return total / (time.perf_counter() - start)
+
+
+async def benchmark(concurrency=50, total=2000):
+    engine.echo = asyncEngine.echo = False
+    workloads = {"公告列表": select(Notice).order_by(Notice.time.desc()).limit(20)}
+    if engine.dialect.name == "mysql":
+        workloads["慢查询（5ms）"] = SLOW_QUERY
+    for name, statement in workloads.items():
+        # 先建立连接池中的连接
+        await throughput(syncRequest(statement), concurrency, concurrency)
+        await throughput(asyncRequest(statement), concurrency, concurrency)
+        syncRate = await throughput(syncRequest(statement), concurrency, total)
+        asyncRate = await throughput(asyncRequest(statement), concurrency, total)
+        print(f"{name}：同步会话 {syncRate:.0f} 请求/秒，异步会话 {asyncRate:.0f} 请求/秒（{concurrency} 并发）")
+    await asyncEngine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(*[int(arg) for arg in sys.argv[1:3]]))
@@ -4,41 +4,41 @@ import os
 import shutil
 
 import oss2
-from robyn import SubRouter, jsonify, serve_file
-from sqlalchemy import or_, extract
+from robyn import jsonify, serve_file
 
 from models import *
+from utils.auditLog import auditLog
 from utils.hooks import *
+from utils.pagination import KeysetPage
+from utils.projection import requestedFields, projectQuery, project
+from utils.router import SessionRouter
 from config import *
 
-accompRouter = SubRouter(__file__, prefix="/accomp")
+accompRouter = SessionRouter(__file__, prefix="/accomp")
 # 初始化阿里云OSS Bucket
 auth = oss2.Auth(OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET)
 bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET_NAME)
 
 
-# TODO：分页/分批
 @accompRouter.post("/getAllAccomps")
+@loginRequired()
+@listParams
 async def getAllAccomps(request):
     # 清空temp文件
     path = "./temp"
     if os.path.exists(path):
         shutil.rmtree(path)  # 删除整个文件夹
         os.makedirs(path)  # 重新创建空文件夹
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    accomps = session.query(Accomplishment).order_by(Accomplishment.date.desc()).all()
-    accomps = [Accomplishment.to_json(acc) for acc in accomps]
+    data = requestData.get()
+    page = KeysetPage(data, Accomplishment.date, Accomplishment.id, descending=True)
+    fields = requestedFields(Accomplishment, data)
+    accomps, nextCursor = page.split(page.apply(projectQuery(Accomplishment.listQuery(), Accomplishment, fields)).all())
+    accomps = [project(acc, fields) for acc in accomps]
     return jsonify({
         "status": 200,
         "message": "全部成果获取成功",
-        "accomps": accomps
+        "accomps": accomps,
+        "nextCursor": nextCursor
     })
 
 
@@ -80,15 +80,9 @@ async def uploadToOSS(request):
 
 
 @accompRouter.post("/addAccomp")
+@loginRequired()
 async def addAccomp(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     accompData = json.loads(data["accompData"])
     title = accompData["title"]
     content = accompData["content"]
@@ -101,9 +95,10 @@ async def addAccomp(request):
     date = datetime.strptime(accompData["date"], "%Y-%m-%d").date()
     accomp = Accomplishment(title=title, content=content, pic=pic, category=category, type=type, authorId=authorId,
                             correspondingAuthorName=correspondingAuthorName, otherNames=otherNames, date=date)
-    log = Log(operatorId=authorId, operation=f"添加研究成果：{title}")
     session.add(accomp)
-    session.add(log)
+    session.flush()
+    auditLog.record(Log(operatorId=authorId, operation=f"添加研究成果：{title}", action=LogAction.ADD,
+                        entityType=LogEntity.ACCOMPLISHMENT, entityId=accomp.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -112,19 +107,14 @@ async def addAccomp(request):
 
 
 @accompRouter.post("/deleteAccomp")
+@loginRequired()
 async def deleteAccomp(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     accompId = data["accompId"]
     accomp = session.query(Accomplishment).get(accompId)
-    if accomp.authorId != userId and not checkUserAuthority(userId, "adminOnly"):
+    if accomp.authorId != userId and not checkUserAuthority(user, "adminOnly"):
         return jsonify({
             "status": -2,
             "message": "权限不足"
@@ -132,8 +122,8 @@ async def deleteAccomp(request):
     if accomp.pic:
         prefix = f'https://{OSS_BUCKET_NAME}.{OSS_ENDPOINT}/'
         bucket.delete_object(accomp.pic[len(prefix):])
-    log = Log(operatorId=userId, operation=f"删除研究成果：{accomp.title}")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"删除研究成果：{accomp.title}", action=LogAction.DELETE,
+                        entityType=LogEntity.ACCOMPLISHMENT, entityId=accomp.id), sync=True)
     session.delete(accomp)
     session.commit()
     return jsonify({
@@ -143,36 +133,38 @@ async def deleteAccomp(request):
 
 
 @accompRouter.post("/searchAccomp")
+@loginRequired()
+@listParams
 async def searchAccomp(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    searchContent = data["searchContent"]
-    existUser = session.query(User).filter(User.username == searchContent).first()
-    existUserId = None if not existUser else existUser.id
-    accomps = session.query(Accomplishment).filter(
-        or_(
-            Accomplishment.title.contains(searchContent),
-            Accomplishment.content.contains(searchContent),
-            Accomplishment.authorId == existUserId,
-            Accomplishment.correspondingAuthorName == searchContent,
-            Accomplishment.otherNames.contains(searchContent),
-        )
-    ).order_by(Accomplishment.date.desc()).all()
-    try:
-        year = int(searchContent)
-        if 1000 <= year <= 3000:
-            accomps = session.query(Accomplishment).filter(
-                extract('year', Accomplishment.date) == year
-            ).order_by(Accomplishment.date.desc()).all()
-    except ValueError:
-        pass
-    accomps = [Accomplishment.to_json(accomp) for accomp in accomps]
+    data = requestData.get()
+    searchContent = (data.get("searchContent") or "").strip()
+    fields = requestedFields(Accomplishment, data)
+    # 可组合的筛选条件：种类、类型、年份、第一作者
+    filters = []
+    for field in ("category", "type", "authorId"):
+        if data.get(field):
+            filters.append(getattr(Accomplishment, field) == int(data[field]))
+    year = int(data["year"]) if data.get("year") else None
+    # 兼容旧版：搜索内容为年份时按年份筛选
+    if searchContent.isdigit() and 1000 <= int(searchContent) <= 3000:
+        year, searchContent = year or int(searchContent), ""
+    if year:
+        filters.append(Accomplishment.inYear(year))
+    query = projectQuery(Accomplishment.listQuery(), Accomplishment, fields).filter(*filters)
+    if searchContent:
+        # 标题、正文、作者名的倒排索引，按相关度排序
+        ranking = searchRanking("accomplishment", searchContent)
+        if ranking is None:
+            accomps = []
+        else:
+            accomps = query.join(ranking, ranking.c.entityId == Accomplishment.id).order_by(
+                ranking.c.hits.desc(),
+                ranking.c.score.desc(),
+                Accomplishment.date.desc()
+            ).all()
+    else:
+        accomps = query.order_by(Accomplishment.date.desc()).all()
+    accomps = [project(accomp, fields) for accomp in accomps]
     return jsonify({
         "status": 200,
         "message": "查找研究成果成功",
@@ -181,24 +173,18 @@ async def searchAccomp(request):
 
 
 @accompRouter.get("/exportAccomps")
+@loginRequired(fromHeaders=True)
 async def exportAccomps(request):
-    headers = request.headers
-    sessionid = headers.get("sessionid")
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    headers = requestData.get()
     year = headers.get("year")
     year = None if year == "" else int(year)
     if year:
-        accomps = session.query(Accomplishment).filter(
-            extract('year', Accomplishment.date) == year
+        accomps = Accomplishment.listQuery().filter(
+            Accomplishment.inYear(year)
         ).order_by(Accomplishment.date.desc()).all()
     else:
-        accomps = session.query(Accomplishment).order_by(Accomplishment.date.desc()).all()
+        accomps = Accomplishment.listQuery().order_by(Accomplishment.date.desc()).all()
     fileName, filePath = generateAccompXlsx(accomps, year)
-    log = Log(operatorId=res["userId"], operation="导出研究成果")
-    session.add(log)
+    auditLog.record(Log(operatorId=currentUser.get().id, operation="导出研究成果", action=LogAction.EXPORT,
+                        entityType=LogEntity.ACCOMPLISHMENT, quantity=len(accomps)))
     return serve_file(file_path=filePath, file_name=fileName)
@@ -0,0 +1,74 @@
+import json
+
+from robyn import jsonify
+
+from utils.hooks import loginRequired, requestData, currentUser, batchUser
+from utils.router import SessionRouter
+
+batchRouter = SessionRouter(__file__)
+# 单次批量请求最多包含的子请求数
+MAX_BATCH_CALLS = 20
+
+
+class BatchRequest:
+    """子请求：只提供各接口用到的 json() 与 headers"""
+
+    def __init__(self, data, headers):
+        self.body = json.dumps(data)
+        self.headers = headers
+        self._data = data
+
+    def json(self):
+        return dict(self._data)
+
+
+async def runCall(call, sessionid, headers):
+    path = call.get("path")
+    handler = SessionRouter.postHandlers.get(path)
+    if handler is None or path == "/batch":
+        return {
+            "status": 404,
+            "message": "接口不存在"
+        }
+    data = {**(call.get("data") or {}), "sessionid": sessionid}
+    try:
+        response = await handler(BatchRequest(data, headers))
+    except Exception as e:
+        return {
+            "status": 500,
+            "message": f"请求处理失败: {str(e)}"
+        }
+    response = getattr(response, "description", response)
+    if isinstance(response, bytes):
+        response = response.decode("utf-8")
+    return json.loads(response)
+
+
+@batchRouter.post("/batch")
+@loginRequired()
+async def batch(request):
+    """
+    批量调用已有的 POST 接口，只认证一次，一次往返返回全部结果
+    请求体：{"sessionid": ..., "calls": [{"path": "/user/getUserInfo", "data": {...}}, ...]}
+    """
+    data = requestData.get()
+    calls = data["calls"]
+    calls = json.loads(calls) if isinstance(calls, str) else calls
+    if len(calls) > MAX_BATCH_CALLS:
+        return jsonify({
+            "status": -2,
+            "message": f"单次最多{MAX_BATCH_CALLS}个请求"
+        })
+    results = []
+    token = batchUser.set(currentUser.get().id)
+    try:
+        # 按原顺序逐个执行：各接口使用同步会话，并发执行并不能重叠数据库等待，且写请求需要保证先后顺序
+        for call in calls:
+            results.append(await runCall(call, data["sessionid"], request.headers))
+    finally:
+        batchUser.reset(token)
+    return jsonify({
+        "status": 200,
+        "message": "批量请求成功",
+        "results": results
+    })
@@ -1,25 +1,27 @@
 import json
 
 from dateutil.relativedelta import relativedelta
-from robyn import SubRouter, jsonify
-from sqlalchemy import or_
+from robyn import jsonify
+from sqlalchemy import or_, and_, select
 
 from models import *
-from utils.hooks import checkSessionid, checkUserAuthority, parse_chinese_year_month, parse_chinese_year
+from utils.auditLog import auditLog
+from utils.hooks import loginRequired, listParams, versioned, requestData, currentUser, tableVersion, \
+    checkUserAuthority, parse_chinese_year_month, parse_chinese_year
+from utils.pagination import KeysetPage, keysetChunks
+from utils.responseCache import cached
+from utils.projection import requestedFields, projectQuery, project
+from utils.router import SessionRouter
+from utils.streaming import streamJson
 
-chemicalRouter = SubRouter(__file__, prefix="/chemical")
+chemicalRouter = SessionRouter(__file__, prefix="/chemical")
 
 
 @chemicalRouter.post("/getThisChemical")
+@loginRequired()
+@cached("chemical")
 async def getThisChemical(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     chemicalId = data["chemicalId"]
     chemical = session.query(Chemical).get(chemicalId)
     chemical = Chemical.to_json(chemical)
@@ -31,24 +33,14 @@ async def getThisChemical(request):
 
 
 @chemicalRouter.post("/getChemicalAmount")
+@loginRequired()
 async def getChemicalAmount(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    allChemicalLength = session.query(Chemical).count()
-    inorganicChemicalLength = session.query(Chemical).filter(Chemical.type == 1).count()
+    counters = StatCounter.read("chemical")
+    allChemicalLength = counters.get("all", 0)
+    inorganicChemicalLength = counters.get("type:1", 0)
     organicChemicalLength = allChemicalLength - inorganicChemicalLength
     # 易制毒制爆
-    dangerousChemicalLength = session.query(Chemical).filter(
-        or_(
-            Chemical.dangerLevel.contains(5),
-            Chemical.dangerLevel.contains(6))
-    ).count()
+    dangerousChemicalLength = counters.get("dangerous", 0)
     return jsonify({
         "status": 200,
         "message": "药品数量获取成功",
@@ -62,54 +54,55 @@ async def getChemicalAmount(request):
 
 
 @chemicalRouter.post("/getChemicals")
+@loginRequired()
+@versioned("chemical")
+@listParams
 async def getChemicals(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     filterType = data["filterType"]
+    page = KeysetPage(data, Chemical.formula, Chemical.id)
+    fields = requestedFields(Chemical, data)
     # 无机药品
     if filterType == "1":
-        chemicals = session.query(Chemical).filter(Chemical.type == 1).order_by(Chemical.formula).all()
+        query = Chemical.listQuery().filter(Chemical.type == 1)
         info = [201, "无机"]
     elif filterType == "2":
-        chemicals = session.query(Chemical).filter(Chemical.type == 2).order_by(Chemical.formula).all()
+        query = Chemical.listQuery().filter(Chemical.type == 2)
         info = [202, "有机"]
     elif filterType == "3":
-        chemicals = session.query(Chemical).filter(
+        query = Chemical.listQuery().filter(
             or_(
                 Chemical.dangerLevel.contains(5),
                 Chemical.dangerLevel.contains(6))
-        ).order_by(Chemical.formula).all()
+        )
         info = [203, "易制毒制爆"]
     else:
-        chemicals = session.query(Chemical).order_by(Chemical.formula).all()
+        query = Chemical.listQuery()
         info = [200, "全部"]
-    # TODO：这样慢，尝试获取每个药品的briefData，或分页获取
-    chemicals = [Chemical.to_json(chemical) for chemical in chemicals]
+    query = projectQuery(query, Chemical, fields)
+    if not page.paginated:
+        # 不分页（旧版小程序）时返回全部药品：分块读取，逐块写入响应体
+        envelope = {"status": info[0], "message": f"{info[1]}药品获取成功", "nextCursor": None, "version": tableVersion.get()}
+        return streamJson(envelope, "chemicals", keysetChunks(query, Chemical.formula, Chemical.id),
+                          lambda chemical: project(chemical, fields))
+    chemicals, nextCursor = page.split(page.apply(query).all())
+    chemicals = [project(chemical, fields) for chemical in chemicals]
     return jsonify({
         "status": info[0],
         "message": f"{info[1]}药品获取成功",
-        "chemicals": chemicals
+        "chemicals": chemicals,
+        "nextCursor": nextCursor,
+        "version": tableVersion.get()
     })
 
 
 @chemicalRouter.post("/getMyChemicals")
+@loginRequired()
 async def getMyChemicals(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    chemicals = session.query(Chemical).filter(Chemical.takerIds.contains(userId)).order_by(Chemical.formula).all()
+    userId = currentUser.get().id
+    chemicals = Chemical.listQuery().join(ChemicalTaker).filter(
+        ChemicalTaker.userId == userId
+    ).order_by(Chemical.formula).all()
     chemicals = [Chemical.to_json(chemical) for chemical in chemicals]
     return jsonify({
         "status": 200,
@@ -119,21 +112,25 @@ async def getMyChemicals(request):
 
 
 @chemicalRouter.post("/searchChemical")
+@loginRequired()
+@listParams
 async def searchChemical(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     searchContent = data["searchContent"]
-    chemicals = session.query(Chemical).filter(or_(
-        Chemical.name.contains(searchContent),
-        Chemical.formula.contains(searchContent)
-    )).order_by(Chemical.formula).all()
-    chemicals = [Chemical.to_json(chemical) for chemical in chemicals]
+    fields = requestedFields(Chemical, data)
+    # 倒排索引按相关度排序，支持名称、化学式、CAS号及拼音首字母
+    ranking = searchRanking("chemical", searchContent)
+    if ranking is None:
+        chemicals = []
+    else:
+        chemicals = projectQuery(Chemical.listQuery(), Chemical, fields).join(
+            ranking, ranking.c.entityId == Chemical.id
+        ).order_by(
+            ranking.c.hits.desc(),
+            ranking.c.score.desc(),
+            Chemical.id
+        ).all()
+    chemicals = [project(chemical, fields) for chemical in chemicals]
     return jsonify({
         "status": 200,
         "message": f"药品查找成功",
@@ -142,15 +139,10 @@ async def searchChemical(request):
 
 
 @chemicalRouter.post("/addChemical")
+@loginRequired()
 async def addChemical(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
+    user = currentUser.get()
     chemicalData = data["chemicalData"]
     chemicalData = json.loads(chemicalData)
     chemical = Chemical(
@@ -168,8 +160,9 @@ async def addChemical(request):
         registerIds=chemicalData["registerIds"],
     )
     session.add(chemical)
-    log = Log(operatorId=res["userId"], operation=f"入库药品：{chemicalData["name"]}")
-    session.add(log)
+    session.flush()
+    auditLog.record(Log(operatorId=user.id, operation=f"入库药品：{chemicalData["name"]}", action=LogAction.ADD,
+                        entityType=LogEntity.CHEMICAL, entityId=chemical.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -178,25 +171,20 @@ async def addChemical(request):
 
 
 @chemicalRouter.post("/deleteChemical")
+@loginRequired()
 async def deleteChemical(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     chemicalId = data["chemicalId"]
     chemical = session.query(Chemical).get(chemicalId)
-    if chemical.responsorId != userId and not checkUserAuthority(userId, "adminOnly"):
+    if chemical.responsorId != userId and not checkUserAuthority(user, "adminOnly"):
         return jsonify({
             "status": -2,
             "message": "权限不足"
         })
-    log = Log(operatorId=userId, operation=f"删除药品：{chemical.name}")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"删除药品：{chemical.name}", action=LogAction.DELETE,
+                        entityType=LogEntity.CHEMICAL, entityId=chemical.id), sync=True)
     session.delete(chemical)
     session.commit()
     return jsonify({
@@ -206,19 +194,14 @@ async def deleteChemical(request):
 
 
 @chemicalRouter.post("/takeChemical")
+@loginRequired()
 async def takeChemical(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     chemicalId = data["chemicalId"]
     chemical = session.query(Chemical).get(chemicalId)
-    if userId in chemical.takerIds:
+    if chemical.takerOf(userId):
         return jsonify({
             "status": -2,
             "message": "您已领用该药品"
@@ -229,12 +212,10 @@ async def takeChemical(request):
             "status": -3,
             "message": "请输入领用药品瓶数（可填写小数），且领用药品瓶数不能大于库存"
         })
-    chemical.takerIds.append(userId)
-    user = session.query(User).get(userId)
-    user.takingChemicalAmount = amount
+    chemical.takers.append(ChemicalTaker(userId=userId, amount=amount))
     chemical.amount -= amount
-    log = Log(operatorId=userId, operation=f"领用药品：{chemical.name} {amount}瓶")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"领用药品：{chemical.name} {amount}瓶", action=LogAction.TAKE,
+                        entityType=LogEntity.CHEMICAL, entityId=chemical.id, quantity=amount))
     session.commit()
     return jsonify({
         "status": 200,
@@ -243,29 +224,23 @@ async def takeChemical(request):
 
 
 @chemicalRouter.post("/returnChemical")
+@loginRequired()
 async def returnChemical(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     chemicalId = data["chemicalId"]
     chemical = session.query(Chemical).get(chemicalId)
-    if userId not in chemical.takerIds:
+    taker = chemical.takerOf(userId)
+    if not taker:
         return jsonify({
             "status": -2,
             "message": "您未领用该药品"
         })
-    chemical.takerIds.remove(userId)
-    user = session.query(User).get(userId)
-    chemical.amount += user.takingChemicalAmount if user.takingChemicalAmount else 0
-    user.takingChemicalAmount = 0
-    log = Log(operatorId=userId, operation=f"归还药品：{chemical.name}")
-    session.add(log)
+    chemical.takers.remove(taker)
+    chemical.amount += taker.amount
+    auditLog.record(Log(operatorId=userId, operation=f"归还药品：{chemical.name}", action=LogAction.RETURN,
+                        entityType=LogEntity.CHEMICAL, entityId=chemical.id, quantity=taker.amount))
     session.commit()
     return jsonify({
         "status": 200,
@@ -274,23 +249,18 @@ async def returnChemical(request):
 
 
 @chemicalRouter.post("/supplementChemical")
+@loginRequired()
 async def supplementChemical(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    userId = currentUser.get().id
     chemicalId = data["chemicalId"]
     amount = float(data["amount"])
     chemical = session.query(Chemical).get(chemicalId)
     chemical.amount += amount
-    chemical.registerIds.append(userId)
-    log = Log(operatorId=userId, operation=f"补充药品：{chemical.name} {amount}瓶")
-    session.add(log)
+    if userId not in chemical.registerIds:
+        chemical.registers.append(ChemicalRegister(userId=userId))
+    auditLog.record(Log(operatorId=userId, operation=f"补充药品：{chemical.name} {amount}瓶", action=LogAction.SUPPLEMENT,
+                        entityType=LogEntity.CHEMICAL, entityId=chemical.id, quantity=amount))
     session.commit()
     return jsonify({
         "status": 200,
@@ -299,19 +269,14 @@ async def supplementChemical(request):
 
 
 @chemicalRouter.post("/modifyChemicalInfo")
+@loginRequired()
 async def modifyChemicalInfo(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     chemicalId = data["chemicalId"]
     chemical = session.query(Chemical).get(chemicalId)
-    if chemical.responsorId != userId and not checkUserAuthority(userId, "adminOnly"):
+    if chemical.responsorId != userId and not checkUserAuthority(user, "adminOnly"):
         return jsonify({
             "status": -2,
             "message": "权限不足"
@@ -328,8 +293,8 @@ async def modifyChemicalInfo(request):
             "status": -2,
             "message": "没有修改的信息"
         })
-    log = Log(operatorId=userId, operation=f"修改药品信息：{chemicalData["name"]}")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"修改药品信息：{chemicalData["name"]}", action=LogAction.MODIFY,
+                        entityType=LogEntity.CHEMICAL, entityId=chemical.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -338,44 +303,50 @@ async def modifyChemicalInfo(request):
 
 
 @chemicalRouter.post("/getLogs")
+@loginRequired("adminOnly", forbiddenMessage="用户无权限")
 async def getLogs(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    user = session.query(User).get(userId)
-    if user.usertype == 1:
-        return jsonify({
-            "status": -2,
-            "message": "用户无权限"
-        })
-    query = session.query(Log).filter(Log.operation.contains("药品"))
+    data = requestData.get()
     keyword = data["keyword"].strip()
+    start = end = operator = chemicalIds = None
     # 先检验日期
     dt = parse_chinese_year_month(keyword)
+    year = None if dt else parse_chinese_year(keyword)
     if dt:
-        start_date = dt.replace(day=1)
-        end_date = start_date + relativedelta(months=1)
-        logs = query.filter(Log.time >= start_date, Log.time < end_date).order_by(Log.time.desc()).all()
-    # 检验药品名
+        start = dt.replace(day=1)
+        end = start + relativedelta(months=1)
+    elif year:
+        start = datetime(year, 1, 1)
+        end = datetime(year + 1, 1, 1)
+    # 检验操作人、药品名
     else:
-        year = parse_chinese_year(keyword)
-        if year:
-            start = datetime(year, 1, 1)
-            end = datetime(year + 1, 1, 1)
-            logs = query.filter(Log.time >= start, Log.time < end).order_by(Log.time.desc()).all()
+        operator = session.query(User).filter(User.username.contains(keyword)).first()
+        if not operator:
+            # 按药品名：先在药品表（远小于日志表）中找到药品id；迁移前无法对应药品（entityId 为空）
+            # 及已删除药品的日志仍按描述文本匹配
+            chemicalIds = [row[0] for row in session.query(Chemical.id).filter(Chemical.name.contains(keyword))]
+
+    # (entityType, time) 与 (operatorId, time) 索引上的范围扫描，热表与归档表的索引相同
+    def logQuery(model):
+        query = model.listQuery().filter(model.entityType == LogEntity.CHEMICAL)
+        if start:
+            query = query.filter(model.time >= start, model.time < end)
+        elif operator:
+            query = query.filter(model.operatorId == operator.id)
+        elif chemicalIds:
+            query = query.filter(or_(
+                model.entityId.in_(chemicalIds),
+                and_(or_(model.entityId.is_(None), model.entityId.notin_(select(Chemical.id))),
+                     model.operation.contains(keyword))
+            ))
         else:
-            operator = session.query(User).filter(User.username.contains(keyword)).first()
-            if operator:
-                logs = query.filter(Log.operatorId == operator.id).order_by(Log.time.desc()).all()
-            else:
-                logs = query.filter(Log.operation.contains(keyword)).order_by(Log.time.desc()).all()
-    logs = [Log.to_json(log) for log in logs]
+            query = query.filter(model.operation.contains(keyword))
+        return query.order_by(model.time.desc())
+
+    # 只有时间范围早于热表中最早的日志时才查询归档表
+    logs = []
+    for model in logTables(start):
+        logs += logQuery(model).all()
+    logs = [log.to_json() for log in logs]
 
     return jsonify({
         "status": 200,
@@ -1,27 +1,27 @@
 import datetime
 import json
 from datetime import timedelta
-from robyn import SubRouter, jsonify
+from robyn import jsonify
 import requests
 from sqlalchemy import or_
 
 from models import *
+from utils.auditLog import auditLog
 from utils.hooks import *
+from utils.pagination import KeysetPage
+from utils.responseCache import cached
+from utils.projection import requestedFields, projectQuery, project
+from utils.router import SessionRouter
 from config import *
 
-equipmentRouter = SubRouter(__file__, prefix="/equipment")
+equipmentRouter = SessionRouter(__file__, prefix="/equipment")
 
 
 @equipmentRouter.post("/getThisEquipment")
+@loginRequired()
+@cached("equipment")
 async def getThisEquipment(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     equipmentId = data["equipmentId"]
     equipment = session.query(Equipment).get(equipmentId)
     equipment = Equipment.to_json(equipment)
@@ -33,19 +33,13 @@ async def getThisEquipment(request):
 
 
 @equipmentRouter.post("/getEquipmentAmount")
+@loginRequired()
 async def getEquipmentAmount(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    normalEquipmentLength = session.query(Equipment).filter(Equipment.status == 1).count()
-    impairedEquipmentLength = session.query(Equipment).filter(Equipment.status == 2).count()
-    repairingEquipmentLength = session.query(Equipment).filter(Equipment.status == 3).count()
-    damagedEquipmentLength = session.query(Equipment).filter(Equipment.status == 4).count()
+    counters = StatCounter.read("equipment")
+    normalEquipmentLength = counters.get("status:1", 0)
+    impairedEquipmentLength = counters.get("status:2", 0)
+    repairingEquipmentLength = counters.get("status:3", 0)
+    damagedEquipmentLength = counters.get("status:4", 0)
     return jsonify({
         "status": 200,
         "message": "设备数量获取成功",
@@ -59,40 +53,35 @@ async def getEquipmentAmount(request):
 
 
 @equipmentRouter.post("/getEquipments")
+@loginRequired()
+@versioned("equipment")
+@listParams
 async def getEquipments(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    # TODO：这样慢，尝试分页获取
-    equipments = session.query(Equipment).order_by(Equipment.name).all()
-    equipments = [Equipment.to_json(equipment) for equipment in equipments]
+    data = requestData.get()
+    page = KeysetPage(data, Equipment.name, Equipment.id)
+    fields = requestedFields(Equipment, data)
+    equipments, nextCursor = page.split(page.apply(projectQuery(Equipment.listQuery(), Equipment, fields)).all())
+    equipments = [project(equipment, fields) for equipment in equipments]
     return jsonify({
         "status": 200,
         "message": "全部设备获取成功",
-        "equipments": equipments
+        "equipments": equipments,
+        "nextCursor": nextCursor,
+        "version": tableVersion.get()
     })
 
 
 @equipmentRouter.post("/searchEquipment")
+@loginRequired()
+@listParams
 async def searchEquipment(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     searchContent = data["searchContent"]
-    equipments = session.query(Equipment).filter(
+    fields = requestedFields(Equipment, data)
+    equipments = projectQuery(Equipment.listQuery(), Equipment, fields).filter(
         Equipment.name.contains(searchContent)
     ).order_by(Equipment.name).all()
-    equipments = [Equipment.to_json(equipment) for equipment in equipments]
+    equipments = [project(equipment, fields) for equipment in equipments]
     return jsonify({
         "status": 200,
         "message": "设备查找成功",
@@ -101,15 +90,10 @@ async def searchEquipment(request):
 
 
 @equipmentRouter.post("/addEquipment")
+@loginRequired()
 async def addEquipment(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
+    user = currentUser.get()
     equipmentData = data["equipmentData"]
     equipmentData = json.loads(equipmentData)
     equipment = Equipment(
@@ -122,8 +106,9 @@ async def addEquipment(request):
         info=equipmentData["info"]
     )
     session.add(equipment)
-    log = Log(operatorId=res["userId"], operation=f"入库设备：{equipmentData['name']}")
-    session.add(log)
+    session.flush()
+    auditLog.record(Log(operatorId=user.id, operation=f"入库设备：{equipmentData['name']}", action=LogAction.ADD,
+                        entityType=LogEntity.EQUIPMENT, entityId=equipment.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -132,16 +117,11 @@ async def addEquipment(request):
 
 
 @equipmentRouter.post("/modifyEquipmentInfo")
+@loginRequired()
 async def modifyEquipmentInfo(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     equipmentId = data["equipmentId"]
     equipment = session.query(Equipment).get(equipmentId)
     if not equipment:
@@ -149,7 +129,7 @@ async def modifyEquipmentInfo(request):
             "status": -3,
             "message": "设备不存在"
         })
-    if equipment.responsorId != userId and not checkUserAuthority(userId, "adminOnly"):
+    if equipment.responsorId != userId and not checkUserAuthority(user, "adminOnly"):
         return jsonify({
             "status": -2,
             "message": "权限不足"
@@ -166,8 +146,8 @@ async def modifyEquipmentInfo(request):
             "status": -2,
             "message": "没有修改的信息"
         })
-    log = Log(operatorId=userId, operation=f"修改设备信息：{equipmentData['name']}")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"修改设备信息：{equipmentData['name']}", action=LogAction.MODIFY,
+                        entityType=LogEntity.EQUIPMENT, entityId=equipment.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -176,25 +156,20 @@ async def modifyEquipmentInfo(request):
 
 
 @equipmentRouter.post("/deleteEquipment")
+@loginRequired()
 async def deleteEquipment(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     equipmentId = data["equipmentId"]
     equipment = session.query(Equipment).get(equipmentId)
-    if equipment.responsorId != userId and not checkUserAuthority(userId, "adminOnly"):
+    if equipment.responsorId != userId and not checkUserAuthority(user, "adminOnly"):
         return jsonify({
             "status": -2,
             "message": "权限不足"
         })
-    log = Log(operatorId=userId, operation=f"删除设备：{equipment.name}")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"删除设备：{equipment.name}", action=LogAction.DELETE,
+                        entityType=LogEntity.EQUIPMENT, entityId=equipment.id), sync=True)
     session.delete(equipment)
     session.commit()
     return jsonify({
@@ -1,59 +1,55 @@
 import datetime
 import json
+from itertools import chain
 from datetime import timedelta
-from robyn import SubRouter, jsonify
+from robyn import jsonify
 import requests
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from sqlalchemy.sql.functions import user
 
 from models import *
+from utils.auditLog import auditLog
 from utils.hooks import *
+from utils.pagination import KeysetPage, keysetChunks
+from utils.responseCache import cached
+from utils.router import SessionRouter
+from utils.streaming import streamJson
 from config import *
 
-extrasRouter = SubRouter(__file__, prefix="/extras")
+extrasRouter = SessionRouter(__file__, prefix="/extras")
 
 
 @extrasRouter.post("/getAllNotice")
+@loginRequired()
+@versioned("notice")
+@cached("notice")
+@listParams
 async def getAllNotice(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    notices = session.query(Notice).order_by(Notice.time.desc()).all()
+    page = KeysetPage(requestData.get(), Notice.time, Notice.id, descending=True)
+    notices = (await asyncSession.execute(page.apply(select(Notice)))).scalars().all()
+    notices, nextCursor = page.split(notices)
     notices = [Notice.to_json(notice) for notice in notices]
     return jsonify({
         "status": 200,
         "message": "全部通知公告获取成功",
-        "notices": notices
+        "notices": notices,
+        "nextCursor": nextCursor,
+        "version": tableVersion.get()
     })
 
 
 @extrasRouter.post("/releaseNotice")
+@loginRequired("adminOnly")
 async def releaseNotice(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    if not checkUserAuthority(userId, "adminOnly"):
-        return jsonify({
-            "status": -2,
-            "message": "权限不足"
-        })
+    data = requestData.get()
+    userId = currentUser.get().id
     title = data["title"]
     content = data["content"]
     notice = Notice(title=title, content=content, releaserId=userId)
     session.add(notice)
-    log = Log(operatorId=userId, operation="发布通知公告")
-    session.add(log)
+    session.flush()
+    auditLog.record(Log(operatorId=userId, operation="发布通知公告", action=LogAction.ADD, entityType=LogEntity.NOTICE,
+                        entityId=notice.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -62,26 +58,15 @@ async def releaseNotice(request):
 
 
 @extrasRouter.post("/deleteNotice")
+@loginRequired("adminOnly")
 async def deleteNotice(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    if not checkUserAuthority(userId, "adminOnly"):
-        return jsonify({
-            "status": -2,
-            "message": "权限不足"
-        })
+    data = requestData.get()
+    userId = currentUser.get().id
     noticeId = data["noticeId"]
     notice = session.query(Notice).get(noticeId)
     session.delete(notice)
-    log = Log(operatorId=userId, operation="删除通知公告")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation="删除通知公告", action=LogAction.DELETE, entityType=LogEntity.NOTICE,
+                        entityId=notice.id), sync=True)
     session.commit()
     return jsonify({
         "status": 200,
@@ -90,26 +75,27 @@ async def deleteNotice(request):
 
 
 @extrasRouter.post("/getAllLogs")
+@loginRequired("superAdminOnly")
+@listParams
 async def getAllLogs(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    user = session.query(User).get(userId)
-    if user.usertype != 6:
-        return jsonify({
-            "status": -2,
-            "message": "权限不足"
-        })
-    logs = session.query(Log).order_by(Log.time.desc()).all()
-    logs = [Log.to_json(log) for log in logs]
+    data = requestData.get()
+    page = KeysetPage(data, Log.time, Log.id, descending=True)
+    if not page.paginated:
+        # 不分页（旧版小程序）时返回全部日志：分块读取热表与归档表，逐块写入响应体
+        rows = chain(keysetChunks(Log.listQuery(), Log.time, Log.id, descending=True),
+                     keysetChunks(LogArchive.listQuery(), LogArchive.time, LogArchive.id, descending=True))
+        return streamJson({"status": 200, "message": "全部日志获取成功", "nextCursor": None}, "logs", rows,
+                          lambda log: log.to_json())
+    logs = page.apply(Log.listQuery()).all()
+    # 热表不足一页时接着查归档表：归档日志都早于热表日志，且保留原id，可按同一游标直接拼接
+    if len(logs) <= page.limit:
+        archivePage = KeysetPage(data, LogArchive.time, LogArchive.id, descending=True)
+        logs += archivePage.apply(LogArchive.listQuery()).all()
+    logs, nextCursor = page.split(logs)
+    logs = [log.to_json() for log in logs]
     return jsonify({
         "status": 200,
         "message": "全部日志获取成功",
-        "logs": logs
+        "logs": logs,
+        "nextCursor": nextCursor
     })
@@ -1,34 +1,39 @@
 import json
 import os
 import oss2
-from robyn import SubRouter, jsonify
+from robyn import jsonify
+from sqlalchemy import select
 
 from config import *
 from models import *
-from utils.hooks import checkSessionid, checkUserAuthority
+from utils.auditLog import auditLog
+from utils.hooks import loginRequired, listParams, versioned, requestData, currentUser, tableVersion
+from utils.pagination import KeysetPage
+from utils.responseCache import cached
+from utils.router import SessionRouter
 
-meetingRouter = SubRouter(__file__, prefix="/meeting")
+meetingRouter = SessionRouter(__file__, prefix="/meeting")
 # 初始化阿里云OSS Bucket
 auth = oss2.Auth(OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET)
 bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET_NAME)
 
 
 @meetingRouter.post("/getAllMeetings")
+@loginRequired()
+@versioned("group_meeting")
+@cached("group_meeting")
+@listParams
 async def getAllMeetings(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    meetings = session.query(GroupMeeting).order_by(GroupMeeting.id.desc()).all()
+    page = KeysetPage(requestData.get(), GroupMeeting.id, GroupMeeting.id, descending=True)
+    meetings = (await asyncSession.execute(page.apply(select(GroupMeeting)))).scalars().all()
+    meetings, nextCursor = page.split(meetings)
     meetings = [GroupMeeting.to_json(meeting) for meeting in meetings]
     return jsonify({
         "status": 200,
         "message": "全部组会安排获取成功",
-        "meetings": meetings
+        "meetings": meetings,
+        "nextCursor": nextCursor,
+        "version": tableVersion.get()
     })
 
 
@@ -71,27 +76,16 @@ async def uploadToOSS(request):
 
 
 @meetingRouter.post("/addMeeting")
+@loginRequired("adminOnly")
 async def addMeeting(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    if not checkUserAuthority(userId, "adminOnly"):
-        return jsonify({
-            "status": -2,
-            "message": "权限不足"
-        })
+    data = requestData.get()
+    userId = currentUser.get().id
     meetingPics = json.loads(data["meetingPics"])
     for meetingPic in meetingPics:
         meeting = GroupMeeting(image=meetingPic)
         session.add(meeting)
-    log = Log(operatorId=userId, operation=f"添加组会安排")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"添加组会安排", action=LogAction.ADD, entityType=LogEntity.MEETING,
+                        quantity=len(meetingPics)))
     session.commit()
     return jsonify({
         "status": 200,
@@ -100,29 +94,18 @@ async def addMeeting(request):
 
 
 @meetingRouter.post("/deleteMeeting")
+@loginRequired("adminOnly")
 async def deleteMeeting(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    if not checkUserAuthority(userId, "adminOnly"):
-        return jsonify({
-            "status": -2,
-            "message": "权限不足"
-        })
+    data = requestData.get()
+    userId = currentUser.get().id
     meetingId = data["meetingId"]
     meeting = session.query(GroupMeeting).get(meetingId)
     image = meeting.image
     prefix = f'https://{OSS_BUCKET_NAME}.{OSS_ENDPOINT}/'
     bucket.delete_object(image[len(prefix):])
     session.delete(meeting)
-    log = Log(operatorId=userId, operation=f"删除组会安排")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"删除组会安排", action=LogAction.DELETE, entityType=LogEntity.MEETING,
+                        entityId=meeting.id), sync=True)
     session.commit()
     return jsonify({
         "status": 200,
@@ -1,15 +1,20 @@
 import datetime
 import json
 from datetime import timedelta
-from robyn import SubRouter, jsonify
-import requests
+from robyn import jsonify
 from sqlalchemy import or_, and_
 
 from models import *
+from utils.auditLog import auditLog
 from utils.hooks import *
+from utils.pagination import KeysetPage
+from utils.projection import requestedFields, projectQuery, project
+from utils.responseCache import cached
+from utils.router import SessionRouter
+from utils.wxClient import wxClient
 from config import *
 
-userRouter = SubRouter(__file__, prefix="/user")
+userRouter = SessionRouter(__file__, prefix="/user")
 
 
 @userRouter.post("/login")
@@ -38,11 +43,13 @@ async def login(request):
             "status": -2,
             "message": "用户不存在",
         })
-    if not user.checkPassword(password):
+    if not await user.checkPasswordAsync(password):
         return jsonify({
             "status": -3,
             "message": "密码错误",
         })
+    if user.needsRehash():
+        user.hashedPassword = await User.hashPasswordAsync(password)
     if user.role == 1 and user.graduateTime:
         if datetime.now().date() > user.graduateTime:
             return jsonify({
@@ -57,8 +64,8 @@ async def login(request):
     signature = calcSignature(user.id)
     rawSessionid = f"userId={user.id}&timestamp={int(time.time())}&signature={signature}&algorithm=sha256"
     sessionid = encode(rawSessionid)
-    log = Log(operatorId=user.id, operation="用户登录（密码登录）")
-    session.add(log)
+    auditLog.record(Log(operatorId=user.id, operation="用户登录（密码登录）", action=LogAction.LOGIN, entityType=LogEntity.USER,
+                        entityId=user.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -87,27 +94,17 @@ async def wxLogin(request):
             "status": -1,
             "message": "openid或session_key不存在"
         })
-    params1 = {
-        "grant_type": "client_credential",
-        "appid": APPID,
-        "secret": APPSECRET,
-    }
-    res1 = requests.get("https://api.weixin.qq.com/cgi-bin/token", params=params1)
-    access_token = res1.json()["access_token"]
+    access_token = await wxClient.getAccessToken()
     if not access_token:
         return jsonify({
             "status": -2,
             "message": "access_token获取失败"
         })
     signature = hmac.new(session_key.encode("utf-8"), b"", hashlib.sha256).hexdigest()
-    params2 = {
-        "access_token": access_token,
-        "openid": openid,
-        "signature": signature,
-        "sig_method": "hmac_sha256"
-    }
-    res2 = requests.get("https://api.weixin.qq.com/wxa/checksession", params=params2)
-    errcode, errmsg = res2.json()["errcode"], res2.json()["errmsg"]
+    res = await wxClient.checkSession(access_token, openid, signature)
+    errcode, errmsg = res.get("errcode"), res.get("errmsg")
+    if errcode in (40001, 42001):
+        wxClient.invalidateAccessToken(access_token)
     if errcode != 0:
         return jsonify({
             "status": -3,
@@ -134,8 +131,8 @@ async def wxLogin(request):
     signature = calcSignature(user.id)
     rawSessionid = f"userId={user.id}&timestamp={int(time.time())}&signature={signature}&algorithm=sha256"
     sessionid = encode(rawSessionid)
-    log = Log(operatorId=user.id, operation="用户登录（微信一键登录）")
-    session.add(log)
+    auditLog.record(Log(operatorId=user.id, operation="用户登录（微信一键登录）", action=LogAction.LOGIN,
+                        entityType=LogEntity.USER, entityId=user.id))
     session.commit()
     return jsonify({
         "status": 200,
@@ -145,22 +142,9 @@ async def wxLogin(request):
 
 
 @userRouter.post("/loginCheck")
+@loginRequired(unauthorizedMessage="用户未登录")
 async def loginCheck(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户未登录"
-        })
-    userId, timestamp = res["userId"], res["timestamp"]
-    if time.time() - float(timestamp) > 10800:  # 3小时
-        return jsonify({
-            "status": -2,
-            "message": "登录已过期，请重新登录"
-        })
-    user = session.query(User).get(userId)
+    user = currentUser.get()
     return jsonify({
         "status": 200,
         "message": "用户已登录",
@@ -173,11 +157,9 @@ async def loginCheck(request):
 
 
 @userRouter.post("/getUserInfo")
+@loginRequired()
 async def getUserInfo(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    userId = checkSessionid(sessionid).get("userId")
-    user = session.query(User).get(userId)
+    user = currentUser.get()
     return jsonify({
         "status": 200,
         "message": "用户信息获取成功",
@@ -186,19 +168,15 @@ async def getUserInfo(request):
 
 
 @userRouter.post("/getUsersInfoByIds")
+@loginRequired()
 async def getUsersInfoByIds(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     userIds = data["userIds"]
     userIds = json.loads(userIds) if isinstance(userIds, str) else list(userIds)
-    users = [session.query(User).get(userId) for userId in userIds]
-    users = [User.to_json(user) for user in users]
+    userIds = [int(userId) for userId in userIds]
+    users = {user.id: user for user in User.listQuery().filter(User.id.in_(userIds)).all()}
+    stuAmounts = User.stuAmounts(list(users))
+    users = [User.to_json(users[userId], stuAmounts) for userId in userIds if userId in users]
     return jsonify({
         "status": 200,
         "message": "用户信息获取成功",
@@ -207,6 +185,7 @@ async def getUsersInfoByIds(request):
 
 
 @userRouter.post("/getAllDirectionNames")
+@cached("direction")
 async def getAllDirectionNames(request):
     directions = session.query(Direction).all()
     directions = [{
@@ -221,6 +200,7 @@ async def getAllDirectionNames(request):
 
 
 @userRouter.post("/getAllSupervisorNames")
+@cached("user")
 async def getAllSupervisorNames(request):
     supervisors = session.query(User).filter(User.role == 2).all()
     supervisors = [{
@@ -277,7 +257,7 @@ async def register(request):
     userUnchecked = UserUnchecked(username=username, gender=gender, email=email, phone=phone, role=role, degree=degree,
                                   workNum=workNum, graduateTime=graduateTime, directionId=directionId,
                                   supervisorId=supervisorId,
-                                  hashedPassword=User.hashPassword(password))
+                                  hashedPassword=await User.hashPasswordAsync(password))
     session.add(userUnchecked)
     session.commit()
     return jsonify({
@@ -288,15 +268,10 @@ async def register(request):
 
 # 管理员审核新注册用户
 @userRouter.post("/checkNewUser")
+@loginRequired("adminOnly", forbiddenStatus=-1)
 async def checkNewUser(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    myId = checkSessionid(sessionid).get("userId")
-    if not checkUserAuthority(myId, "adminOnly"):
-        return jsonify({
-            "status": -1,
-            "message": "权限不足"
-        })
+    data = requestData.get()
+    myId = currentUser.get().id
     opinion = int(data["opinion"])
     if opinion != 1 and opinion != 2:
         return jsonify({
@@ -319,8 +294,8 @@ async def checkNewUser(request):
             message = "用户未通过审核"
             print("邮件发送失败", e)
         finally:
-            log = Log(operatorId=myId, operation=f"拒绝用户「{uncheckedUser.username}」注册")
-            session.add(log)
+            auditLog.record(Log(operatorId=myId, operation=f"拒绝用户「{uncheckedUser.username}」注册", action=LogAction.REJECT,
+                                entityType=LogEntity.USER), sync=True)
             session.delete(uncheckedUser)
             session.commit()
             return jsonify({
@@ -342,10 +317,12 @@ async def checkNewUser(request):
                     directionId=uncheckedUser.directionId, supervisorId=uncheckedUser.supervisorId,
                     hashedPassword=uncheckedUser.hashedPassword)
         session.add(user)
-        log = Log(operatorId=myId, operation=f"同意用户「{uncheckedUser.username}」注册")
-        session.add(log)
+        session.flush()
+        auditLog.record(Log(operatorId=myId, operation=f"同意用户「{uncheckedUser.username}」注册", action=LogAction.APPROVE,
+                            entityType=LogEntity.USER, entityId=user.id), sync=True)
         session.delete(uncheckedUser)
         session.commit()
+        userDirectory.invalidate()
         return jsonify({
             "status": 200,
             "message": "用户通过审核，注册成功"
@@ -355,19 +332,13 @@ async def checkNewUser(request):
 @userRouter.post("/getOpenidAndSessionKey")
 async def getOpenidAndSessionKey(request):
     tempCode = request.json().get("tempCode")
-    params = {
-        "appid": APPID,
-        "secret": APPSECRET,
-        "js_code": tempCode,
-        "grant_type": "authorization_code",
-    }
-    response = requests.get("https://api.weixin.qq.com/sns/jscode2session", params=params)
-    openid = response.json().get("openid")
-    session_key = response.json().get("session_key")
+    res = await wxClient.code2Session(tempCode)
+    openid = res.get("openid")
+    session_key = res.get("session_key")
     if not openid or not session_key:
         return jsonify({
             "status": -1,
-            "message": response.json().get("errmsg")
+            "message": res.get("errmsg")
         })
     return jsonify({
         "status": 200,
@@ -378,11 +349,10 @@ async def getOpenidAndSessionKey(request):
 
 
 @userRouter.post("/storeOpenid")
+@loginRequired()
 async def storeOpenid(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    userId = checkSessionid(sessionid).get("userId")
-    user = session.query(User).get(userId)
+    data = requestData.get()
+    user = currentUser.get()
     openid = data["openid"]
     if not user.openid:
         user.openid = openid
@@ -390,6 +360,7 @@ async def storeOpenid(request):
         for exiUser in existUsers:
             exiUser.openid = None
         session.commit()
+        userDirectory.invalidate()
         return jsonify({
             "status": 200,
             "message": "openid保存成功"
@@ -462,9 +433,9 @@ async def resetPassword(request):
             "status": -2,
             "message": "验证码已过期"
         })
-    user.hashedPassword = User.hashPassword("12345")
-    log = Log(operatorId=user.id, operation=f"用户重置密码")
-    session.add(log)
+    user.hashedPassword = await User.hashPasswordAsync("12345")
+    auditLog.record(Log(operatorId=user.id, operation=f"用户重置密码", action=LogAction.RESET_PASSWORD,
+                        entityType=LogEntity.USER, entityId=user.id), sync=True)
     session.commit()
     return jsonify({
         "status": 200,
@@ -473,15 +444,9 @@ async def resetPassword(request):
 
 
 @userRouter.post("/getSupervisorInfo")
+@loginRequired(unauthorizedMessage="用户未登录")
 async def getSupervisorInfo(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户未登录"
-        })
+    data = requestData.get()
     stuId = data["stuId"]
     student = session.query(User).get(stuId)
     supervisor = session.query(User).get(student.supervisorId)
@@ -498,22 +463,15 @@ async def getSupervisorInfo(request):
 
 
 @userRouter.post("/getEquipmentAndChemicalInfo")
+@loginRequired(unauthorizedMessage="用户未登录")
 async def getEquipmentAndChemicalInfo(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户未登录"
-        })
-    userId = res["userId"]
+    userId = currentUser.get().id
     equipmentCount = session.query(Equipment).filter(Equipment.responsorId == userId).count()
     equipmentEgName = session.query(Equipment).filter(
         Equipment.responsorId == userId).first().name if equipmentCount > 0 else None
-    chemicalCount = session.query(Chemical).filter(Chemical.takerIds.contains(userId)).count()
-    chemicalEgName = session.query(Chemical).filter(
-        Chemical.takerIds.contains(userId)).first().name if chemicalCount > 0 else None
+    chemicalCount = session.query(ChemicalTaker).filter(ChemicalTaker.userId == userId).count()
+    chemicalEgName = session.query(Chemical).join(ChemicalTaker).filter(
+        ChemicalTaker.userId == userId).first().name if chemicalCount > 0 else None
     return jsonify({
         "status": 200,
         "message": "领用设备及药品信息获取成功",
@@ -525,17 +483,11 @@ async def getEquipmentAndChemicalInfo(request):
 
 
 @userRouter.post("/modifyUserInfo")
+@loginRequired(unauthorizedMessage="用户未登录")
 async def modifyUserInfo(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户未登录"
-        })
-    userId = res["userId"]
-    user = session.query(User).get(userId)
+    data = requestData.get()
+    user = currentUser.get()
+    userId = user.id
     modified = False
     userData = data["userData"]
     userData = json.loads(userData)
@@ -551,9 +503,10 @@ async def modifyUserInfo(request):
             "status": -2,
             "message": "没有修改的信息"
         })
-    log = Log(operatorId=userId, operation=f"修改用户信息")
-    session.add(log)
+    auditLog.record(Log(operatorId=userId, operation=f"修改用户信息", action=LogAction.MODIFY, entityType=LogEntity.USER,
+                        entityId=userId), sync=True)
     session.commit()
+    userDirectory.invalidate()
     return jsonify({
         "status": 200,
         "message": "用户信息修改成功"
@@ -561,25 +514,18 @@ async def modifyUserInfo(request):
 
 
 @userRouter.post("/modifyPassword")
+@loginRequired(unauthorizedMessage="用户未登录")
 async def modifyPassword(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户未登录"
-        })
-    userId = res["userId"]
-    user = session.query(User).get(userId)
+    data = requestData.get()
+    user = currentUser.get()
     oldPassword = data["oldPassword"]
     newPassword = data["newPassword"]
-    if not user.checkPassword(oldPassword):
+    if not await user.checkPasswordAsync(oldPassword):
         return jsonify({
             "status": -2,
             "message": "原密码输入错误"
         })
-    user.hashedPassword = User.hashPassword(newPassword)
+    user.hashedPassword = await User.hashPasswordAsync(newPassword)
     session.commit()
     return jsonify({
         "status": 200,
@@ -588,50 +534,26 @@ async def modifyPassword(request):
 
 
 @userRouter.post("/getAllUsers")
+@loginRequired()
+@listParams
 async def getAllUsers(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    users = session.query(User).order_by(User.username).all()
-    users = [{
-        "id": user.id,
-        "username": user.username,
-        "gender": user.gender,
-        "role": user.role,
-        "degree": user.degree,
-        "avatarUrl": user.avatarUrl,
-        "workNum": user.workNum,
-        "supervisorId": user.supervisorId,
-        "stuAmount": user.stuAmount,
-    } for user in users]
+    data = requestData.get()
+    page = KeysetPage(data, User.username, User.id)
+    fields = requestedFields(User, data) or User.FIELD_PROFILES["full"]
+    users, nextCursor = page.split(page.apply(projectQuery(session.query(User), User, fields)).all())
+    stuAmounts = User.stuAmounts([user.id for user in users if user.role == 2]) if "stuAmount" in fields else {}
+    users = [project(user, fields, stuAmount=stuAmounts.get(user.id, 0)) for user in users]
     return jsonify({
         "status": 200,
         "message": "全部用户信息获取成功",
-        "users": users
+        "users": users,
+        "nextCursor": nextCursor
     })
 
 
 @userRouter.post("/getUncheckedUsersAmount")
+@loginRequired("adminOnly")
 async def getUncheckedUsersAmount(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    if not checkUserAuthority(userId, "AdminOnly"):
-        return jsonify({
-            "status": -2,
-            "message": "权限不足"
-        })
     uncheckedUsersAmount = session.query(UserUnchecked).count()
     return jsonify({
         "status": 200,
@@ -641,22 +563,9 @@ async def getUncheckedUsersAmount(request):
 
 
 @userRouter.post("/getUncheckedUsersInfo")
+@loginRequired("adminOnly")
 async def getUncheckedUsersInfo(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
-    userId = res["userId"]
-    if not checkUserAuthority(userId, "AdminOnly"):
-        return jsonify({
-            "status": -2,
-            "message": "权限不足"
-        })
-    uncheckedUsers = session.query(UserUnchecked).order_by(UserUnchecked.username).all()
+    uncheckedUsers = UserUnchecked.listQuery().order_by(UserUnchecked.username).all()
     uncheckedUsers = [UserUnchecked.to_json(unchecked) for unchecked in uncheckedUsers]
     return jsonify({
         "status": 200,
@@ -666,45 +575,33 @@ async def getUncheckedUsersInfo(request):
 
 
 @userRouter.post("/searchUser")
+@loginRequired()
+@listParams
 async def searchUser(request):
-    data = request.json()
-    sessionid = data["sessionid"]
-    res = checkSessionid(sessionid)
-    if not res:
-        return jsonify({
-            "status": -1,
-            "message": "用户无权限"
-        })
+    data = requestData.get()
     searchContent = data["searchContent"]
     keywords = ["学生", "教师", "老师", "学士", "硕士", "博士"]
+    fields = requestedFields(User, data) or User.FIELD_PROFILES["full"]
+    query = projectQuery(session.query(User), User, fields)
     try:
         int(searchContent)
-        users = session.query(User).filter(User.workNum.contains(searchContent)).order_by(User.username).all()
+        users = query.filter(User.workNum.contains(searchContent)).order_by(User.username).all()
     except ValueError:
-        users = session.query(User).filter(User.username.contains(searchContent)).order_by(User.username).all()
+        users = query.filter(User.username.contains(searchContent)).order_by(User.username).all()
     if len(users) == 0:
         if searchContent in keywords[0] or keywords[0] in searchContent:
-            users = session.query(User).filter(User.role == 1).order_by(User.username).all()
+            users = query.filter(User.role == 1).order_by(User.username).all()
         elif searchContent in keywords[1] or keywords[1] in searchContent or searchContent in keywords[2] or keywords[
             2] in searchContent:
-            users = session.query(User).filter(User.role == 2).order_by(User.username).all()
+            users = query.filter(User.role == 2).order_by(User.username).all()
         elif searchContent in keywords[3] or keywords[3] in searchContent:
-            users = session.query(User).filter(User.degree == 1).order_by(User.username).all()
+            users = query.filter(User.degree == 1).order_by(User.username).all()
         elif searchContent in keywords[4] or keywords[4] in searchContent:
-            users = session.query(User).filter(User.degree == 2).order_by(User.username).all()
+            users = query.filter(User.degree == 2).order_by(User.username).all()
         elif searchContent in keywords[5] or keywords[5] in searchContent:
-            users = session.query(User).filter(User.degree == 3).order_by(User.username).all()
-    users = [{
-        "id": user.id,
-        "username": user.username,
-        "gender": user.gender,
-        "role": user.role,
-        "degree": user.degree,
-        "avatarUrl": user.avatarUrl,
-        "workNum": user.workNum,
-        "supervisorId": user.supervisorId,
-        "stuAmount": user.stuAmount,
-    } for user in users]
+            users = query.filter(User.degree == 3).order_by(User.username).all()
+    stuAmounts = User.stuAmounts([user.id for user in users if user.role == 2]) if "stuAmount" in fields else {}
+    users = [project(user, fields, stuAmount=stuAmounts.get(user.id, 0)) for user in users]
     return jsonify({
         "status": 200,
         "message": "查找用户信息获取成功",
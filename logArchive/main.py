@@ -0,0 +1,24 @@
+"""
+日志归档：把 LOG_HOT_MONTHS 个月之前的整月日志从 log 表移入 log_archive 表
+用法：在项目根目录执行 python -m logArchive.main，建议由 crontab 每月1日执行一次
+"""
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+
+import config
+from models import session, archiveLogs
+
+# 热表保留的月数（含当月）
+LOG_HOT_MONTHS = getattr(config, "LOG_HOT_MONTHS", 6)
+
+
+def archive():
+    before = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    before -= relativedelta(months=LOG_HOT_MONTHS - 1)
+    moved = archiveLogs(session, before)
+    print(f"已归档 {before:%Y-%m} 之前的日志 {moved} 条")
+
+
+if __name__ == "__main__":
+    archive()
@@ -0,0 +1,64 @@
+"""
+登录密码校验基准：在事件循环中直接执行 bcrypt 与放到线程池（models.passwordExecutor）执行的对比，
+报告单个工作进程每秒可完成的登录数，以及期间事件循环的最长停顿（停顿期间该进程无法响应任何其他请求）
+用法：在项目根目录执行 python -m loginBenchmark.main [并发数] [登录次数]，哈希成本取配置中的 BCRYPT_ROUNDS
+"""
+import asyncio
+import sys
+import time
+
+from models import User, BCRYPT_ROUNDS, BCRYPT_WORKERS
+
+PASSWORD = "benchmark-password"
+TICK = 0.001
+
+
+async def inlineLogin(user):
+    return user.checkPassword(PASSWORD)
+
+
+async def executorLogin(user):
+    return await user.checkPasswordAsync(PASSWORD)
+
+
+# 返回 (每秒登录数, 事件循环最长停顿毫秒)
+async def run(login, user, concurrency, total):
+    remaining = total
+    maxStall = 0
+    done = False
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await login(user)
+
+    # 每 TICK 秒醒来一次，实际间隔超出的部分即事件循环被阻塞的时间
+    async def ticker():
+        nonlocal maxStall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(TICK)
+            now = time.perf_counter()
+            maxStall = max(maxStall, now - last - TICK)
+            last = now
+
+    tickerTask = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    done = True
+    await tickerTask
+    return total / elapsed, maxStall * 1000
+
+
+async def benchmark(concurrency=8, total=64):
+    user = User(hashedPassword=User.hashPassword(PASSWORD))
+    print(f"bcrypt 成本 {BCRYPT_ROUNDS}，线程池 {BCRYPT_WORKERS} 个线程，{concurrency} 并发，{total} 次登录")
+    for name, login in (("事件循环中执行", inlineLogin), ("线程池中执行", executorLogin)):
+        rate, stall = await run(login, user, concurrency, total)
+        print(f"{name}：{rate:.1f} 次登录/秒，事件循环最长停顿 {stall:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(*[int(arg) for arg in sys.argv[1:3]]))
@@ -1,10 +1,20 @@
-from datetime import datetime
-from sqlalchemy import create_engine, ForeignKey, Boolean, Column, Integer, String, Text, JSON, DateTime, Date, Float
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, date
+from sqlalchemy import create_engine, event, inspect, func, and_, or_, case, select, Index, ForeignKey, Boolean, Column, Integer, String, Text, JSON, DateTime, Date, Float
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, async_scoped_session
+from sqlalchemy.orm import sessionmaker, scoped_session, object_session, declarative_base, relationship, joinedload, \
+    raiseload, selectinload, load_only
 from sqlalchemy.ext.mutable import MutableList
 from bcrypt import hashpw, gensalt, checkpw
 
+import config
 from config import DATABASE_URI
+from utils.search import chemicalTokens, accomplishmentTokens, queryTerms
+from utils.serializers import serializer
 
 engine = create_engine(
     DATABASE_URI,
@@ -14,6 +24,20 @@ engine = create_engine(
     pool_timeout=60,  # 连接超时时间
     pool_recycle=3600  # 连接回收时间，防止连接被数据库关闭
 )
+# 异步引擎（aiomysql驱动），连接池配置与同步引擎一致，查询不阻塞事件循环
+asyncEngine = create_async_engine(
+    make_url(DATABASE_URI).set(drivername="mysql+aiomysql"),
+    echo=True,
+    pool_size=20,
+    max_overflow=30,
+    pool_timeout=60,
+    pool_recycle=3600
+)
+# bcrypt工作因子，修改后用户下次登录时自动按新成本重新哈希
+BCRYPT_ROUNDS = getattr(config, "BCRYPT_ROUNDS", 12)
+# bcrypt计算时释放GIL，放入有界线程池执行，避免阻塞事件循环
+BCRYPT_WORKERS = getattr(config, "BCRYPT_WORKERS", 4)
+passwordExecutor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
 # 数据库表基类
 Base = declarative_base()
 naming_convention = {
@@ -26,25 +50,31 @@ naming_convention = {
 Base.metadata.naming_convention = naming_convention
 # 会话，用于通过ORM操作数据库
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-session = Session()
+# 当前请求的会话作用域（由 utils.router.SessionRouter 在请求开始时设置，脚本中为None即共用一个会话）
+requestScope = ContextVar("requestScope", default=None)
+# 请求级会话：每个请求拥有独立的会话，请求结束时提交/回滚并关闭
+session = scoped_session(Session, scopefunc=requestScope.get)
+# 异步会话（可选）：处理函数中 await asyncSession.execute(...) 即使用，生命周期同上
+AsyncSession = async_sessionmaker(bind=asyncEngine, autoflush=False, expire_on_commit=False)
+asyncSession = async_scoped_session(AsyncSession, scopefunc=requestScope.get)
 
 
 class User(Base):
     __tablename__ = "user"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    username = Column(String(60), nullable=False)
+    username = Column(String(60), nullable=False, index=True)
     hashedPassword = Column(Text, nullable=False)
     # 性别：男1/女2
     gender = Column(Integer, nullable=False)
-    email = Column(String(60), nullable=True)
-    phone = Column(String(60), nullable=True)
+    email = Column(String(60), nullable=True, index=True)
+    phone = Column(String(60), nullable=True, index=True)
     # 用户身份：学生1/教师2
     role = Column(Integer, default=False)
     # 用户权限级：普通用户1/普通管理员2/超级管理员6
     usertype = Column(Integer, nullable=False, default=1)
     # 学历：学士1/硕士2/博士3/其他4
     degree = Column(Integer, nullable=True)
-    workNum = Column(String, nullable=True)
+    workNum = Column(String, nullable=True, index=True)
     graduateTime = Column(Date, nullable=True)
     avatarUrl = Column(Text, nullable=True)
     openid = Column(Text, nullable=True)
@@ -54,19 +84,31 @@ class User(Base):
     directionId = Column(Integer, ForeignKey("direction.id"), nullable=True)
     direction = relationship("Direction", backref="users")
     # 导师（学生特有）
-    supervisorId = Column(Integer, nullable=True)
+    supervisorId = Column(Integer, nullable=True, index=True)
+
+    # openid 为 Text 列，只能建前缀索引
+    __table_args__ = (
+        Index("ix_user_openid", "openid", mysql_length=64),
+    )
 
     # 学生数（教师特有）
     @property
     def stuAmount(self):
         if self.role == 2:
-            return session.query(User).filter(
+            return object_session(self).query(User).filter(
                 User.role == 1,
                 User.supervisorId == self.id).count()
         return 0
 
-    # 领用药品量（0-100）
-    takingChemicalAmount = Column(Integer, nullable=True, default=0)
+    # 批量统计学生数：一次 GROUP BY 查询，返回 {导师id: 学生数}，供列表接口使用
+    @staticmethod
+    def stuAmounts(supervisorIds=None):
+        query = session.query(User.supervisorId, func.count(User.id)).filter(
+            User.role == 1,
+            User.supervisorId.isnot(None))
+        if supervisorIds is not None:
+            query = query.filter(User.supervisorId.in_(supervisorIds))
+        return dict(query.group_by(User.supervisorId).all())
 
     # 是否有效
     @property
@@ -78,13 +120,47 @@ class User(Base):
 
     @staticmethod  # 静态方法归属于类的命名空间，同时能够在不依赖类的实例的情况下调用
     def hashPassword(password):
-        hashedPwd = hashpw(password.encode("utf-8"), gensalt())
+        hashedPwd = hashpw(password.encode("utf-8"), gensalt(rounds=BCRYPT_ROUNDS))
         return hashedPwd.decode("utf-8")
 
     def checkPassword(self, password):
         return checkpw(password.encode("utf-8"), self.hashedPassword.encode("utf-8"))
 
-    def to_json(self):
+    # 以下异步版本在线程池中执行bcrypt，供处理函数使用
+    @staticmethod
+    async def hashPasswordAsync(password):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(passwordExecutor, User.hashPassword, password)
+
+    async def checkPasswordAsync(self, password):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(passwordExecutor, checkpw, password.encode("utf-8"),
+                                          self.hashedPassword.encode("utf-8"))
+
+    # 哈希成本与当前配置不一致（形如 $2b$12$...）
+    def needsRehash(self):
+        return int(self.hashedPassword.split("$")[2]) != BCRYPT_ROUNDS
+
+    # 列表查询的加载策略：to_json 需要研究方向名
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls).options(joinedload(cls.direction))
+
+    # 用户列表的字段集（见 utils/projection.py）
+    FIELD_PROFILES = {
+        "brief": ("id", "username", "avatarUrl", "role"),
+        "full": ("id", "username", "gender", "role", "degree", "avatarUrl", "workNum", "supervisorId", "stuAmount"),
+    }
+    FIELD_COLUMNS = {"stuAmount": ("role",)}
+    # 列表的 keyset 排序列：投影时总是一并查询，避免分页、分块时逐行懒加载
+    SORT_COLUMNS = ("username",)
+
+    # stuAmounts：User.stuAmounts() 的结果，传入时不再逐个用户统计
+    def to_json(self, stuAmounts=None):
+        if stuAmounts is None:
+            stuAmount = self.stuAmount
+        else:
+            stuAmount = stuAmounts.get(self.id, 0) if self.role == 2 else 0
         data = {
             "id": self.id,
             "username": self.username,
@@ -100,7 +176,7 @@ class User(Base):
             "activeScore": self.activeScore,
             "isPrivate": self.isPrivate,
             "supervisorId": self.supervisorId,
-            "stuAmount": self.stuAmount,
+            "stuAmount": stuAmount,
             "isValid": self.isValid,
         }
         if self.directionId:
@@ -112,7 +188,7 @@ class User(Base):
 class UserUnchecked(Base):
     __tablename__ = "user_unchecked"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    username = Column(String(60), nullable=False)
+    username = Column(String(60), nullable=False, index=True)
     hashedPassword = Column(Text, nullable=False)
     gender = Column(Integer, nullable=False)
     email = Column(String(60), nullable=True)
@@ -126,6 +202,11 @@ class UserUnchecked(Base):
     supervisorId = Column(Integer, nullable=True)
     joinTime = Column(DateTime, nullable=False, default=datetime.now)
 
+    # 列表查询的加载策略：to_json 需要研究方向名
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls).options(joinedload(cls.direction))
+
     def to_json(self):
         data = {
             "id": self.id,
@@ -154,14 +235,7 @@ class Direction(Base):
     description = Column(Text, nullable=True)
     responsorId = Column(Integer, nullable=True)
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "name": self.name,
-            "description": self.description,
-            "responsorId": self.responsorId,
-        }
-        return data
+    JSON_FIELDS = ("id", "name", "description", "responsorId")
 
 
 # 项目
@@ -182,25 +256,13 @@ class Item(Base):
     startTime = Column(DateTime, nullable=False)
     endTime = Column(DateTime, nullable=False)
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "name": self.name,
-            "description": self.description,
-            "type": self.type,
-            "status": self.status,
-            "responsorId": self.responsorId,
-            "memberIds": self.memberIds,
-            "startTime": self.startTime,
-            "endTime": self.endTime,
-        }
-        return data
+    JSON_FIELDS = ("id", "name", "description", "type", "status", "responsorId", "memberIds", "startTime", "endTime")
 
 
 class Equipment(Base):
     __tablename__ = "equipment"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(60), nullable=False)
+    name = Column(String(60), nullable=False, index=True)
     # 设备状态：正常1/异常2/维修3/报废4
     status = Column(Integer, nullable=True)
     function = Column(Text, nullable=True)
@@ -212,19 +274,26 @@ class Equipment(Base):
     responsor = relationship("User", backref="equipments")
     info = Column(Text, nullable=True)
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "name": self.name,
-            "status": self.status,
-            "function": self.function,
-            "operateRegulation": self.operateRegulation,
-            "imageUrl": self.imageUrl,
-            "responsorId": self.responsorId,
-            "responsorName": self.responsor.username,
-            "info": self.info,
-        }
-        return data
+    @property
+    def responsorName(self):
+        return userDirectory.username(self.responsorId)
+
+    # 列表查询的加载策略：负责人姓名取自 userDirectory，禁止逐行懒加载
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls).options(raiseload(cls.responsor))
+
+    # 设备列表的字段集（见 utils/projection.py）
+    FIELD_PROFILES = {
+        "brief": ("id", "name", "status", "imageUrl"),
+        "full": ("id", "name", "status", "function", "operateRegulation", "imageUrl", "responsorId", "responsorName",
+                 "info"),
+    }
+    FIELD_COLUMNS = {"responsorName": ("responsorId",)}
+    # 列表的 keyset 排序列：投影时总是一并查询，避免分页、分块时逐行懒加载
+    SORT_COLUMNS = ("name",)
+
+    JSON_FIELDS = FIELD_PROFILES["full"]
 
 
 class Chemical(Base):
@@ -249,40 +318,74 @@ class Chemical(Base):
         return 2 if self.amount <= 1 else 1  # 2: 短缺, 1: 充足
 
     # 入库人（多个）
-    registerIds = Column(MutableList.as_mutable(JSON()), nullable=False, default=[])
+    registers = relationship("ChemicalRegister", backref="chemical", cascade="all, delete-orphan")
     # 药品负责人（一位）
     responsorId = Column(Integer, ForeignKey("user.id"), nullable=False)
     responsor = relationship("User", backref="chemicals")
-    # 领用人（多个）
-    takerIds = Column(MutableList.as_mutable(JSON()), nullable=True, default=[])
+    # 领用人（多个），每人的领用瓶数记在 ChemicalTaker.amount
+    takers = relationship("ChemicalTaker", backref="chemical", cascade="all, delete-orphan")
     info = Column(Text, nullable=True)
 
-    def to_json(self):
-        # 去重
-        if self.registerIds and self.registerIds != list(set(self.registerIds)):
-            self.registerIds = list(set(self.registerIds))
-            session.commit()
-        if self.takerIds and self.takerIds != list(set(self.takerIds)):
-            self.takerIds = list(set(self.takerIds))
-            session.commit()
-        data = {
-            "id": self.id,
-            "name": self.name,
-            "formula": self.formula,
-            "CAS": self.CAS,
-            "type": self.type,
-            "dangerLevel": self.dangerLevel,
-            "status": self.status,
-            "purity": self.purity,
-            "amount": self.amount,
-            "specification": self.specification,
-            "site": self.site,
-            "registerIds": self.registerIds,
-            "responsorId": self.responsorId,
-            "takerIds": self.takerIds,
-            "info": self.info,
-        }
-        return data
+    # formula 为 Text 列，只能建前缀索引
+    __table_args__ = (
+        Index("ix_chemical_formula", "formula", mysql_length=64),
+    )
+
+    # 以下两个属性保持原 JSON 列的接口：读取为id列表，赋值时去重并保留已有记录
+    @property
+    def registerIds(self):
+        return [register.userId for register in self.registers]
+
+    @registerIds.setter
+    def registerIds(self, userIds):
+        existing = {register.userId: register for register in self.registers}
+        self.registers = [existing.get(userId) or ChemicalRegister(userId=userId)
+                          for userId in dict.fromkeys(userIds or [])]
+
+    @property
+    def takerIds(self):
+        return [taker.userId for taker in self.takers]
+
+    @takerIds.setter
+    def takerIds(self, userIds):
+        existing = {taker.userId: taker for taker in self.takers}
+        self.takers = [existing.get(userId) or ChemicalTaker(userId=userId) for userId in dict.fromkeys(userIds or [])]
+
+    def takerOf(self, userId):
+        return next((taker for taker in self.takers if taker.userId == userId), None)
+
+    # 列表查询的加载策略：入库人、领用人各用一条 IN 查询批量加载
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls).options(selectinload(cls.registers), selectinload(cls.takers))
+
+    # 药品列表的字段集（见 utils/projection.py）：列表页只需名称、化学式、状态和数量
+    FIELD_PROFILES = {
+        "brief": ("id", "name", "formula", "status", "amount"),
+        "full": ("id", "name", "formula", "CAS", "type", "dangerLevel", "status", "purity", "amount", "specification",
+                 "site", "registerIds", "responsorId", "takerIds", "info"),
+    }
+    FIELD_COLUMNS = {"status": ("amount",)}
+    # 列表的 keyset 排序列：投影时总是一并查询，避免分页、分块时逐行懒加载
+    SORT_COLUMNS = ("formula",)
+
+    JSON_FIELDS = FIELD_PROFILES["full"]
+
+
+# 药品入库人：联合主键 (药品, 用户)，userId 单独建索引
+class ChemicalRegister(Base):
+    __tablename__ = "chemical_register"
+    chemicalId = Column(Integer, ForeignKey("chemical.id", ondelete="CASCADE"), primary_key=True)
+    userId = Column(Integer, ForeignKey("user.id"), primary_key=True, index=True)
+
+
+# 药品领用人：联合主键 (药品, 用户)，userId 单独建索引，“我的药品”走索引连接
+class ChemicalTaker(Base):
+    __tablename__ = "chemical_taker"
+    chemicalId = Column(Integer, ForeignKey("chemical.id", ondelete="CASCADE"), primary_key=True)
+    userId = Column(Integer, ForeignKey("user.id"), primary_key=True, index=True)
+    # 领用瓶数，归还时加回库存
+    amount = Column(Float, nullable=False, default=0)
 
 
 class ChemicalRecord(Base):
@@ -294,13 +397,18 @@ class ChemicalRecord(Base):
     user = relationship("User", backref="chemical_records")
     info = Column(Text, nullable=True)
 
+    # 列表查询的加载策略：需要药品名，用户名取自 userDirectory
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls).options(joinedload(cls.chemical), raiseload(cls.user))
+
     def to_json(self):
         data = {
             "id": self.id,
             "chemicalId": self.chemicalId,
             "chemicalName": self.chemical.name,
             "userId": self.userId,
-            "username": self.user.username,
+            "username": userDirectory.username(self.userId),
             "info": self.info,
         }
         return data
@@ -318,18 +426,7 @@ class GroupMeeting(Base):
     startTime = Column(DateTime, nullable=True)
     image = Column(Text, nullable=True)
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "routine": self.routine,
-            "venue": self.venue,
-            "theme": self.theme,
-            "desciption": self.desciption,
-            "reporterIds": self.reporterIds,
-            "startTime": self.startTime,
-            "image": self.image,
-        }
-        return data
+    JSON_FIELDS = ("id", "routine", "venue", "theme", "desciption", "reporterIds", "startTime", "image")
 
 
 # 组会报告
@@ -344,16 +441,7 @@ class Report(Base):
     content = Column(Text, nullable=True)
     time = Column(DateTime, nullable=True)
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "reporterId": self.reporterId,
-            "otherIds": self.otherIds,
-            "type": self.type,
-            "content": self.content,
-            "time": self.time,
-        }
-        return data
+    JSON_FIELDS = ("id", "reporterId", "otherIds", "type", "content", "time")
 
 
 # 成果
@@ -366,7 +454,7 @@ class Accomplishment(Base):
 
     @property
     def authorName(self):
-        return self.author.username if self.author else None
+        return userDirectory.username(self.authorId) if self.authorId else None
 
     correspondingAuthorName = Column(String(60), nullable=True)
     otherNames = Column(Text, nullable=True)
@@ -377,42 +465,138 @@ class Accomplishment(Base):
     # 论文成果：中科院一区1/中科院二区2/中科院三区3/中科院四区4/EI5/中文核心6/其他7
     # 项目成果：国际级1/国家级2/省级3/校级4
     type = Column(Integer, nullable=True)
-    date = Column(Date, nullable=True)
+    date = Column(Date, nullable=True, index=True)
+
+    # 按年份筛选：用日期范围代替 extract(year)，可走 date 列上的索引
+    @classmethod
+    def inYear(cls, year):
+        return and_(cls.date >= date(year, 1, 1), cls.date < date(year + 1, 1, 1))
+
+    # 列表查询的加载策略：作者姓名取自 userDirectory，禁止逐行懒加载
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls).options(raiseload(cls.author))
+
+    # 成果列表的字段集（见 utils/projection.py）
+    FIELD_PROFILES = {
+        "brief": ("id", "title", "authorName", "category", "type", "date"),
+        "full": ("id", "title", "authorId", "authorName", "correspondingAuthorName", "otherNames", "content", "pic",
+                 "category", "type", "date"),
+    }
+    FIELD_COLUMNS = {"authorName": ("authorId",)}
+    # 列表的 keyset 排序列：投影时总是一并查询，避免分页、分块时逐行懒加载
+    SORT_COLUMNS = ("date",)
+
+    JSON_FIELDS = FIELD_PROFILES["full"]
+
+
+# 日志动作
+class LogAction:
+    ADD = 1
+    DELETE = 2
+    MODIFY = 3
+    TAKE = 4
+    RETURN = 5
+    SUPPLEMENT = 6
+    LOGIN = 7
+    EXPORT = 8
+    APPROVE = 9
+    REJECT = 10
+    RESET_PASSWORD = 11
+
+
+# 日志操作对象类型
+class LogEntity:
+    CHEMICAL = 1
+    EQUIPMENT = 2
+    ACCOMPLISHMENT = 3
+    MEETING = 4
+    NOTICE = 5
+    USER = 6
+
+
+class LogRecord:
+    """日志表与归档表共用的列"""
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # 面向展示的描述文本，筛选一律使用下面的结构化列
+    operation = Column(Text, nullable=True)
+    time = Column(DateTime, default=datetime.now, index=True)
+    # 动作（见 LogAction）
+    action = Column(Integer, nullable=True)
+    # 操作对象类型（见 LogEntity）及id，批量操作或对象已不存在时id为空
+    entityType = Column(Integer, nullable=True)
+    entityId = Column(Integer, nullable=True)
+    # 数量（领用、补充药品的瓶数等）
+    quantity = Column(Float, nullable=True)
+
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls)
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "title": self.title,
-            "authorId": self.authorId,
-            "authorName": self.authorName,
-            "correspondingAuthorName": self.correspondingAuthorName,
-            "otherNames": self.otherNames,
-            "content": self.content,
-            "pic": self.pic,
-            "category": self.category,
-            "type": self.type,
-            "date": self.date,
-        }
-        return data
+    @property
+    def operatorName(self):
+        return userDirectory.username(self.operatorId)
+
+    JSON_FIELDS = ("id", "operatorId", "operatorName", "operation", "time", "action", "entityType", "entityId",
+                   "quantity")
 
 
-class Log(Base):
+# 近期日志（热数据），更早的整月日志由 logArchive/main.py 定期移入 LogArchive
+class Log(LogRecord, Base):
     __tablename__ = "log"
-    id = Column(Integer, primary_key=True, autoincrement=True)
     operatorId = Column(Integer, ForeignKey("user.id"), nullable=False)
     operator = relationship("User", backref="logs")
-    operation = Column(Text, nullable=True)
-    time = Column(DateTime, default=datetime.now)
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "operatorId": self.operatorId,
-            "operatorName": self.operator.username,
-            "operation": self.operation,
-            "time": self.time,
-        }
-        return data
+    __table_args__ = (
+        Index("ix_log_entityType_time", "entityType", "time"),
+        Index("ix_log_operatorId_time", "operatorId", "time"),
+    )
+
+    # 列表查询的加载策略：操作人姓名取自 userDirectory，禁止逐行懒加载
+    @classmethod
+    def listQuery(cls):
+        return session.query(cls).options(raiseload(cls.operator))
+
+
+# 归档日志：保留原id（游标分页可从热表无缝翻到归档表），压缩行格式存储，不约束操作人外键
+class LogArchive(LogRecord, Base):
+    __tablename__ = "log_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    operatorId = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_log_archive_entityType_time", "entityType", "time"),
+        Index("ix_log_archive_operatorId_time", "operatorId", "time"),
+        {"mysql_row_format": "COMPRESSED"},
+    )
+
+
+def logTables(start=None):
+    """
+    查询时间范围（起点 start，None 表示不限）需要的日志表，按时间从新到旧排列：
+    归档表只存放热表最早日志之前的整月，起点不早于热表最早日志时只查热表
+    """
+    oldest = session.query(func.min(Log.time)).scalar()
+    if start is not None and oldest is not None and start >= oldest:
+        return [Log]
+    return [Log, LogArchive]
+
+
+def archiveLogs(targetSession, before, batchSize=1000):
+    """把 before 之前的日志按批移入归档表，每批单独提交，返回移动的行数"""
+    columns = [column.key for column in LogArchive.__table__.columns]
+    moved = 0
+    while True:
+        ids = [row[0] for row in
+               targetSession.query(Log.id).filter(Log.time < before).order_by(Log.id).limit(batchSize)]
+        if not ids:
+            break
+        targetSession.execute(LogArchive.__table__.insert().from_select(
+            columns, select(*[getattr(Log, column) for column in columns]).where(Log.id.in_(ids))))
+        targetSession.execute(Log.__table__.delete().where(Log.id.in_(ids)))
+        targetSession.commit()
+        moved += len(ids)
+    return moved
 
 
 class EmailCaptcha(Base):
@@ -423,14 +607,7 @@ class EmailCaptcha(Base):
     userId = Column(Integer, ForeignKey("user.id"), nullable=False)
     user = relationship("User", backref="emailCaptchas")
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "captcha": self.captcha,
-            "createdTime": self.createdTime,
-            "userId": self.userId,
-        }
-        return data
+    JSON_FIELDS = ("id", "captcha", "createdTime", "userId")
 
 
 class Notice(Base):
@@ -442,15 +619,341 @@ class Notice(Base):
     releaserId = Column(Integer, ForeignKey("user.id"), nullable=False)
     releaser = relationship("User", backref="notices")
 
-    def to_json(self):
-        data = {
-            "id": self.id,
-            "title": self.title,
-            "content": self.content,
-            "time": self.time,
-            "releaserId": self.releaserId,
-        }
-        return data
+    JSON_FIELDS = ("id", "title", "content", "time", "releaserId")
+
+
+class UserEntry:
+    __slots__ = ("username", "role", "usertype", "directionName")
+
+    def __init__(self, username, role, usertype, directionName):
+        self.username = username
+        self.role = role
+        self.usertype = usertype
+        self.directionName = directionName
+
+
+class UserDirectory:
+    """
+    用户目录：进程内缓存 id -> 用户名/身份/权限/研究方向，供各 to_json 使用，避免列表中逐行懒加载User
+    本进程写用户时调用 invalidate() 立即失效；其他进程的写入由 sync() 按 user 表版本号发现（增删用户、改用户名或角色），
+    其余变化最多在 ttl 秒后重新加载
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}
+        self._loadedAt = 0
+        self._version = None
+
+    def _load(self):
+        with Session() as loadSession:
+            # 先读版本号再读用户：其间有写入时下次 sync 会再加载一次，不会漏掉变化
+            self._version = loadSession.query(TableVersion.version).filter(TableVersion.tableName == "user").scalar()
+            rows = loadSession.query(User.id, User.username, User.role, User.usertype, Direction.name).outerjoin(
+                Direction, User.directionId == Direction.id).all()
+        self._entries = {row[0]: UserEntry(*row[1:]) for row in rows}
+        self._loadedAt = time.monotonic()
+
+    # version：请求中读取的 user 表当前版本号；与目录加载时的版本号不同（其他进程改了用户）则立即重新加载
+    def sync(self, version):
+        if version is not None and version != self._version:
+            self._load()
+
+    def get(self, userId):
+        if time.monotonic() - self._loadedAt > self.ttl:
+            self._load()
+        entry = self._entries.get(userId)
+        # 新用户可能尚未进入目录，至多每秒重新加载一次
+        if entry is None and userId is not None and time.monotonic() - self._loadedAt > 1:
+            self._load()
+            entry = self._entries.get(userId)
+        return entry
+
+    def username(self, userId):
+        entry = self.get(userId)
+        return entry.username if entry else None
+
+    def invalidate(self):
+        self._loadedAt = 0
+
+
+userDirectory = UserDirectory()
+
+
+# 统计计数器：每个 (表, 分类) 一行，随增删改在同一事务中增减，供首页统计接口 O(1) 读取
+class StatCounter(Base):
+    __tablename__ = "stat_counter"
+    tableName = Column(String(30), primary_key=True)
+    category = Column(String(30), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+    # 读取某表的全部计数（只读）：计数行由迁移初始化；缺失时临时全量统计，不在请求中写回
+    @staticmethod
+    def read(tableName):
+        counters = dict(session.query(StatCounter.category, StatCounter.value).filter(
+            StatCounter.tableName == tableName).all())
+        if not counters:
+            counters = countCategories(session, tableName)
+        return counters
+
+
+def chemicalCategories(type, dangerLevel):
+    categories = {"all"}
+    if type == 1:
+        categories.add("type:1")
+    # 易制毒制爆
+    if dangerLevel and (5 in dangerLevel or 6 in dangerLevel):
+        categories.add("dangerous")
+    return categories
+
+
+def equipmentCategories(status):
+    categories = {"all"}
+    if status in (1, 2, 3, 4):
+        categories.add(f"status:{status}")
+    return categories
+
+
+# 被计数的模型 -> (表名, 全部分类, 分类依赖的列, 分类函数)
+COUNTERS = {
+    Chemical: ("chemical", ("all", "type:1", "dangerous"), ("type", "dangerLevel"), chemicalCategories),
+    Equipment: ("equipment", ("all", "status:1", "status:2", "status:3", "status:4"), ("status",),
+                equipmentCategories),
+}
+
+
+def _categoriesOf(obj, columns, categoriesFunc, old=False):
+    state = inspect(obj)
+    values = []
+    for column in columns:
+        history = state.attrs[column].history
+        values.append(history.deleted[0] if old and history.deleted else getattr(obj, column))
+    return categoriesFunc(*values)
+
+
+@event.listens_for(Session, "after_flush")
+def updateCounters(flushSession, flushContext):
+    deltas = {}
+    for obj in flushSession.new | flushSession.dirty | flushSession.deleted:
+        if type(obj) not in COUNTERS:
+            continue
+        tableName, _, columns, categoriesFunc = COUNTERS[type(obj)]
+        before = set() if obj in flushSession.new else _categoriesOf(obj, columns, categoriesFunc, old=True)
+        after = set() if obj in flushSession.deleted else _categoriesOf(obj, columns, categoriesFunc)
+        for category in before - after:
+            deltas[(tableName, category)] = deltas.get((tableName, category), 0) - 1
+        for category in after - before:
+            deltas[(tableName, category)] = deltas.get((tableName, category), 0) + 1
+    connection = flushSession.connection()
+    for (tableName, category), delta in deltas.items():
+        if delta:
+            connection.execute(StatCounter.__table__.update().where(
+                StatCounter.tableName == tableName,
+                StatCounter.category == category
+            ).values(value=StatCounter.value + delta))
+
+
+# 全量统计某表各分类的行数，只读
+def countCategories(targetSession, tableName):
+    for model, (name, allCategories, columns, categoriesFunc) in COUNTERS.items():
+        if name != tableName:
+            continue
+        counts = dict.fromkeys(allCategories, 0)
+        for row in targetSession.query(*[getattr(model, column) for column in columns]):
+            for category in categoriesFunc(*row):
+                counts[category] += 1
+        return counts
+
+
+# 全量重算计数器（由 statCounterReconcile/main.py 定时执行，修正原地修改 JSON 列等未被追踪的变化）
+def reconcileCounters(targetSession, tableName=None):
+    result = {}
+    for name, *_ in COUNTERS.values():
+        if tableName and name != tableName:
+            continue
+        counts = countCategories(targetSession, name)
+        targetSession.query(StatCounter).filter(StatCounter.tableName == name).delete()
+        targetSession.add_all([StatCounter(tableName=name, category=category, value=value)
+                               for category, value in counts.items()])
+        result[name] = counts
+    targetSession.flush()
+    return result
+
+
+# 表版本号：被轮询的列表所在的表每次写入（同一事务中）版本号加一，客户端带上次的版本号即可判断列表是否变化
+class TableVersion(Base):
+    __tablename__ = "table_version"
+    tableName = Column(String(30), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+    # 多张表的当前版本号：表名 -> 版本号（一次查询）；尚未建立版本行的表不在结果中（此时不判断未变化）
+    @staticmethod
+    async def readMany(tableNames):
+        result = await asyncSession.execute(select(TableVersion.tableName, TableVersion.version).where(
+            TableVersion.tableName.in_(tableNames)))
+        return dict(result.all())
+
+
+# 模型 -> 写入时需要升版本的表（入库人、领用人出现在药品列表中，负责人姓名出现在设备列表中）
+# 用户只在增删或修改用户名、角色时升版本（导师姓名列表）
+VERSIONED_TABLES = {
+    Direction: ("direction",),
+    Notice: ("notice",),
+    Chemical: ("chemical",),
+    ChemicalRegister: ("chemical",),
+    ChemicalTaker: ("chemical",),
+    Equipment: ("equipment",),
+    GroupMeeting: ("group_meeting",),
+}
+
+
+@event.listens_for(Session, "after_flush")
+def bumpTableVersions(flushSession, flushContext):
+    tableNames = set()
+    for obj in flushSession.new | flushSession.dirty | flushSession.deleted:
+        if type(obj) is User:
+            if obj in flushSession.new or obj in flushSession.deleted:
+                tableNames.add("user")
+                continue
+            attrs = inspect(obj).attrs
+            if attrs.username.history.has_changes():
+                tableNames.update(("user", "equipment"))
+            elif attrs.role.history.has_changes():
+                tableNames.add("user")
+        elif type(obj) in VERSIONED_TABLES:
+            if obj in flushSession.dirty and not flushSession.is_modified(obj):
+                continue
+            tableNames.update(VERSIONED_TABLES[type(obj)])
+    if not tableNames:
+        return
+    flushSession.connection().execute(TableVersion.__table__.update().where(
+        TableVersion.tableName.in_(sorted(tableNames))
+    ).values(version=TableVersion.version + 1))
+
+
+# 搜索倒排索引：每行为 (实体类型, 索引词, 实体id, 权重)，随增删改在同一事务中更新（分词规则见 utils/search.py）
+class SearchToken(Base):
+    __tablename__ = "search_token"
+    entityType = Column(String(20), primary_key=True)
+    token = Column(String(60), primary_key=True)
+    entityId = Column(Integer, primary_key=True, index=True)
+    weight = Column(Float, nullable=False, default=1)
+
+
+# 被索引的模型 -> (实体类型, 参与分词的列, 分词函数)
+SEARCH_INDEXES = {
+    Chemical: ("chemical", ("name", "formula", "CAS"), chemicalTokens),
+    Accomplishment: ("accomplishment", ("title", "content", "correspondingAuthorName", "otherNames", "authorId"),
+                     lambda title, content, correspondingAuthorName, otherNames, authorId: accomplishmentTokens(
+                         title, content, [correspondingAuthorName, otherNames, userDirectory.username(authorId)])),
+}
+
+
+def _tokenRows(obj):
+    entityType, columns, tokensFunc = SEARCH_INDEXES[type(obj)]
+    tokens = tokensFunc(*[getattr(obj, column) for column in columns])
+    return [{"entityType": entityType, "token": token, "entityId": obj.id, "weight": weight}
+            for token, weight in tokens.items()]
+
+
+# 作者用户名在其成果的索引中：修改用户名时按新用户名重建该用户全部成果的索引词（用户目录此时仍是旧用户名）
+def _reindexAuthorAccomplishments(connection, user):
+    table = SearchToken.__table__
+    accomps = connection.execute(select(
+        Accomplishment.id, Accomplishment.title, Accomplishment.content,
+        Accomplishment.correspondingAuthorName, Accomplishment.otherNames
+    ).where(Accomplishment.authorId == user.id)).all()
+    if not accomps:
+        return
+    connection.execute(table.delete().where(table.c.entityType == "accomplishment",
+                                            table.c.entityId.in_([accomp.id for accomp in accomps])))
+    rows = [{"entityType": "accomplishment", "token": token, "entityId": accomp.id, "weight": weight}
+            for accomp in accomps
+            for token, weight in accomplishmentTokens(accomp.title, accomp.content, [
+                accomp.correspondingAuthorName, accomp.otherNames, user.username]).items()]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+@event.listens_for(Session, "after_flush")
+def updateSearchIndex(flushSession, flushContext):
+    table = SearchToken.__table__
+    connection = flushSession.connection()
+    for obj in flushSession.new | flushSession.dirty | flushSession.deleted:
+        if type(obj) is User:
+            if obj in flushSession.dirty and inspect(obj).attrs.username.history.has_changes():
+                _reindexAuthorAccomplishments(connection, obj)
+            continue
+        if type(obj) not in SEARCH_INDEXES:
+            continue
+        entityType, columns, _ = SEARCH_INDEXES[type(obj)]
+        if obj in flushSession.dirty and not any(inspect(obj).attrs[column].history.has_changes()
+                                                 for column in columns):
+            continue
+        if obj not in flushSession.new:
+            connection.execute(table.delete().where(table.c.entityType == entityType, table.c.entityId == obj.id))
+        if obj not in flushSession.deleted:
+            rows = _tokenRows(obj)
+            if rows:
+                connection.execute(table.insert(), rows)
+
+
+# 全量重建索引（由 searchIndexRebuild/main.py 执行，用于初始化或分词规则变更后）
+def rebuildSearchIndex(targetSession, entityType=None, batchSize=1000):
+    table = SearchToken.__table__
+    for model, (name, columns, _) in SEARCH_INDEXES.items():
+        if entityType and name != entityType:
+            continue
+        targetSession.execute(table.delete().where(table.c.entityType == name))
+        lastId = 0
+        while True:
+            objs = targetSession.query(model).options(load_only(*[getattr(model, column) for column in columns])) \
+                .filter(model.id > lastId).order_by(model.id).limit(batchSize).all()
+            if not objs:
+                break
+            rows = [row for obj in objs for row in _tokenRows(obj)]
+            if rows:
+                targetSession.execute(table.insert(), rows)
+            lastId = objs[-1].id
+    targetSession.flush()
+
+
+def searchRanking(entityType, text):
+    """
+    匹配的实体及相关度子查询 (entityId, hits, score)：hits 为命中的索引词数，score 为命中词权重之和
+    汉字词精确匹配且须全部命中（氯化钠 不匹配只含 氯化 的 氯化钾），字母数字词按前缀匹配
+    （token 列上的前缀 LIKE 可走主键索引）；查询串无可用词时返回 None
+    """
+    exact, prefixes = queryTerms(text)
+    if not exact and not prefixes:
+        return None
+    conditions = [SearchToken.token.in_(exact)] if exact else []
+    # 前缀只含小写字母与数字，直接拼出模式串：LIKE ? || '%' 这类表达式无法用索引做范围扫描
+    conditions += [SearchToken.token.like(prefix + "%") for prefix in prefixes]
+    query = session.query(
+        SearchToken.entityId.label("entityId"),
+        func.count(SearchToken.token).label("hits"),
+        func.sum(SearchToken.weight).label("score")
+    ).filter(
+        SearchToken.entityType == entityType,
+        or_(*conditions)
+    ).group_by(SearchToken.entityId)
+    if exact:
+        query = query.having(func.sum(case((SearchToken.token.in_(exact), 1), else_=0)) == len(exact))
+    return query.subquery()
+
+
+# 导入时为各模型生成 to_json（JSON_FIELDS）及各命名字段集的序列化函数（见 utils/serializers.py）
+def compileSerializers():
+    for model in (Direction, Item, Equipment, Chemical, GroupMeeting, Report, Accomplishment, Log, LogArchive,
+                  EmailCaptcha, Notice):
+        model.to_json = serializer(model, model.JSON_FIELDS)
+        for fields in getattr(model, "FIELD_PROFILES", {}).values():
+            serializer(model, fields)
+
+
+compileSerializers()
+
 
 # 创建所有表（被alembic替代）
 # if __name__ == "__main__":
@@ -0,0 +1,101 @@
+"""
+列表接口查询次数检查：在临时库中分别生成少量与较多的数据，调用各列表接口并统计 SQL 语句数，
+语句数随行数变化（出现逐行懒加载，即 N+1 查询）即以非零状态退出
+用法：在项目根目录执行 python -m queryCountCheck.main
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, date, timedelta
+
+import app  # 导入即注册全部接口（SessionRouter.postHandlers）
+from bluePrints.batch import BatchRequest
+from models import session, userDirectory, User, UserUnchecked, Direction, Equipment, Accomplishment, Log, \
+    LogAction, LogEntity
+from utils.benchmark import scratchDatabase, StatementCounter
+from utils.hooks import calcSignature, encode
+from utils.router import SessionRouter
+
+# 第一次与第二次检查时每张表的行数（均在一页、一个分块之内）
+ROW_COUNTS = (5, 15)
+ADMIN_ID = 1
+LIST_CALLS = {
+    "/extras/getAllLogs": {},
+    "/chemical/getLogs": {"keyword": "领用"},
+    "/equipment/getEquipments": {},
+    "/equipment/searchEquipment": {"searchContent": "设备"},
+    "/accomp/getAllAccomps": {},
+    "/accomp/searchAccomp": {"searchContent": "成果"},
+    "/user/getUncheckedUsersInfo": {},
+    "/user/getUsersInfoByIds": {},
+}
+
+
+def sessionid(userId):
+    return encode(f"userId={userId}&timestamp={int(time.time())}&signature={calcSignature(userId)}&algorithm=sha256")
+
+
+# 每行关联不同的用户、研究方向，逐行懒加载时会各自产生一次查询
+def seed(start, amount):
+    numbers = range(start, start + amount)
+    directions = [Direction(name=f"研究方向{i}") for i in numbers]
+    session.add_all(directions)
+    session.flush()
+    users = [User(username=f"用户{i}", gender=1, role=1 + i % 2, usertype=1, hashedPassword="",
+                  directionId=direction.id, supervisorId=ADMIN_ID) for i, direction in zip(numbers, directions)]
+    session.add_all(users)
+    session.add_all([UserUnchecked(username=f"待审核{i}", gender=1, role=1, workNum=str(i), hashedPassword="",
+                                   directionId=direction.id) for i, direction in zip(numbers, directions)])
+    session.commit()
+    # 成果的索引词用到作者用户名：先让用户目录载入新用户
+    userDirectory.invalidate()
+    userDirectory.get(ADMIN_ID)
+    now = datetime.now()
+    for i, user in zip(numbers, users):
+        session.add(Equipment(name=f"设备{i}", responsorId=user.id))
+        session.add(Accomplishment(title=f"成果{i}", authorId=user.id, category=1, type=1,
+                                   date=date(2024, 1, 1) + timedelta(days=i)))
+        session.add(Log(operatorId=user.id, operation=f"领用药品：药品{i}", time=now - timedelta(minutes=i),
+                        action=LogAction.TAKE, entityType=LogEntity.CHEMICAL))
+    session.commit()
+    session.remove()
+
+
+async def countStatements():
+    counts = {}
+    userIds = [row[0] for row in session.query(User.id)]
+    session.remove()
+    for path, data in LIST_CALLS.items():
+        if path == "/user/getUsersInfoByIds":
+            data = {"userIds": userIds}
+        request = BatchRequest({**data, "sessionid": sessionid(ADMIN_ID)}, {})
+        with StatementCounter() as counter:
+            await SessionRouter.postHandlers[path](request)
+        counts[path] = counter.count
+    return counts
+
+
+def check():
+    scratchDatabase(withAsync=True)
+    session.add(Direction(name="研究方向"))
+    session.add(User(id=ADMIN_ID, username="管理员", gender=1, role=2, usertype=6, hashedPassword="", directionId=1))
+    session.commit()
+    results, seeded = [], 0
+    for rowCount in ROW_COUNTS:
+        seed(seeded, rowCount - seeded)
+        seeded = rowCount
+        results.append(asyncio.run(countStatements()))
+    failed = []
+    for path in LIST_CALLS:
+        counts = [result[path] for result in results]
+        print(f"{path}: " + "，".join(f"{rows}行 {count}条语句" for rows, count in zip(ROW_COUNTS, counts)))
+        if len(set(counts)) > 1:
+            failed.append(path)
+    if failed:
+        print("以下接口的查询次数随行数增长：" + "、".join(failed))
+        sys.exit(1)
+    print("查询次数检查通过！")
+
+
+if __name__ == "__main__":
+    check()
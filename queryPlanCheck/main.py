@@ -0,0 +1,59 @@
+"""
+热点查询执行计划检查：对登录/注册查找与列表分页查询执行 EXPLAIN，出现全表扫描（type=ALL）即以非零状态退出
+用法：在项目根目录执行 python -m queryPlanCheck.main，需连接与线上数据量相近的 MySQL（表很小时优化器可能直接选择全表扫描）
+"""
+import sys
+
+from sqlalchemy import and_, or_, func, text
+
+from models import engine, session, User, UserUnchecked, Chemical, Equipment, Accomplishment, Log
+from utils.pagination import KeysetPage, encodeCursor
+
+SAMPLE = "sample"
+
+
+# 列表第二页的查询：带游标条件，检查排序列索引能否用于范围扫描
+def nextPage(query, sortColumn, idColumn, sortValue, descending=False):
+    page = KeysetPage({"limit": 20, "cursor": encodeCursor([sortValue, 1])}, sortColumn, idColumn, descending)
+    return page.apply(query)
+
+
+HOT_QUERIES = {
+    "login": lambda: session.query(User).filter(or_(User.username == SAMPLE, User.phone == SAMPLE)),
+    "wxLogin": lambda: session.query(User).filter(User.openid == SAMPLE),
+    "register.phone": lambda: session.query(User).filter(User.phone == SAMPLE),
+    "register.email": lambda: session.query(User).filter(User.email == SAMPLE),
+    "register.workNum": lambda: session.query(User).filter(User.workNum == SAMPLE),
+    "register.unchecked": lambda: session.query(UserUnchecked).filter(
+        and_(UserUnchecked.username == SAMPLE, UserUnchecked.email == SAMPLE)),
+    "resetPassword": lambda: session.query(User).filter(User.username == SAMPLE, User.workNum == SAMPLE),
+    "stuAmount": lambda: session.query(func.count(User.id)).filter(User.role == 1, User.supervisorId == 1),
+    "getAllLogs": lambda: nextPage(session.query(Log), Log.time, Log.id, "2024-01-01T00:00:00", descending=True),
+    "getAllAccomp": lambda: nextPage(session.query(Accomplishment), Accomplishment.date, Accomplishment.id,
+                                     "2024-01-01", descending=True),
+    "getChemicals": lambda: nextPage(session.query(Chemical), Chemical.formula, Chemical.id, "NaCl"),
+    "getEquipments": lambda: nextPage(session.query(Equipment), Equipment.name, Equipment.id, SAMPLE),
+}
+
+
+def explain(query):
+    sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as connection:
+        return [row._asdict() for row in connection.execute(text("EXPLAIN " + sql))]
+
+
+def check():
+    failed = []
+    for name, build in HOT_QUERIES.items():
+        for row in explain(build()):
+            print(f"{name}: table={row['table']} type={row['type']} key={row['key']} rows={row['rows']}")
+            if row["type"] == "ALL":
+                failed.append(name)
+    if failed:
+        print("以下查询存在全表扫描：" + "、".join(dict.fromkeys(failed)))
+        sys.exit(1)
+    print("执行计划检查通过！")
+
+
+if __name__ == "__main__":
+    check()
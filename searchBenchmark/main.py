@@ -0,0 +1,87 @@
+"""
+药品搜索基准：在临时库中生成合成药品，比较倒排索引搜索与原 LIKE 查询的耗时和结果数
+用法：在项目根目录执行 python -m searchBenchmark.main [药品数量] [数据库地址]，默认 50000 条、临时 SQLite 文件；
+传入空的 MySQL 库地址可得到与线上一致的结果
+"""
+import random
+import sys
+
+from sqlalchemy import or_, insert
+
+from models import session, User, Chemical, searchRanking, rebuildSearchIndex
+from utils.benchmark import scratchDatabase, measure
+
+ANIONS = ["氯化", "溴化", "碘化", "硫酸", "硝酸", "碳酸", "磷酸", "醋酸", "氢氧化", "高锰酸", "氧化", "硫化"]
+CATIONS = [("钠", "Na"), ("钾", "K"), ("钙", "Ca"), ("镁", "Mg"), ("铜", "Cu"), ("铁", "Fe"), ("锌", "Zn"),
+           ("银", "Ag"), ("铝", "Al"), ("钡", "Ba"), ("锰", "Mn"), ("铵", "NH4")]
+GRADES = ["", "（分析纯）", "（优级纯）", "（化学纯）", "溶液"]
+# 每 KNOWN_EVERY 条插入一条真实药品，使 CAS 号查询有可匹配的行
+KNOWN_CHEMICALS = [("氯化钠", "NaCl", "7647-14-5"), ("氯化钾", "KCl", "7447-40-7"), ("硫酸铜", "CuSO4", "7758-98-7"),
+                   ("氢氧化钠", "NaOH", "1310-73-2"), ("碳酸钙", "CaCO3", "471-34-1")]
+KNOWN_EVERY = 500
+QUERIES = ["氯化钠", "硫酸", "铜", "NaCl", "Fe", "7647-14", "lhn"]
+REPEAT = 20
+
+
+def syntheticChemicals(amount):
+    random.seed(0)
+    for i in range(amount):
+        anion = random.choice(ANIONS)
+        cation, symbol = random.choice(CATIONS)
+        name = f"{anion}{cation}"
+        formula = f"{symbol}{random.choice(['Cl', 'Br', 'SO4', 'NO3', 'CO3', 'PO4', 'OH', 'O'])}"
+        CAS = f"{random.randint(1000, 99999)}-{random.randint(10, 99)}-{random.randint(0, 9)}"
+        if i % KNOWN_EVERY == 0:
+            name, formula, CAS = KNOWN_CHEMICALS[i // KNOWN_EVERY % len(KNOWN_CHEMICALS)]
+        yield {
+            "name": f"{name}{random.choice(GRADES)}",
+            "formula": formula,
+            "CAS": CAS,
+            "amount": random.randint(0, 20),
+            "dangerLevel": [],
+            "responsorId": 1,
+        }
+
+
+# 原搜索只匹配名称和化学式；这里加上 CAS 号，与索引搜索比较同样的功能
+def likeSearch(keyword):
+    return session.query(Chemical.id).filter(
+        or_(Chemical.name.contains(keyword), Chemical.formula.contains(keyword), Chemical.CAS.contains(keyword))
+    ).all()
+
+
+# 与 searchChemical 相同的查询
+def indexSearch(keyword):
+    ranking = searchRanking("chemical", keyword)
+    return session.query(Chemical.id).join(ranking, ranking.c.entityId == Chemical.id).order_by(
+        ranking.c.hits.desc(),
+        ranking.c.score.desc(),
+        Chemical.id
+    ).all()
+
+
+def benchmark(amount=50000, url=None):
+    scratchDatabase(url)
+    session.add(User(username="benchmark", gender=1, role=2, usertype=6, hashedPassword=""))
+    session.flush()
+    rows = list(syntheticChemicals(amount))
+    for i in range(0, len(rows), 5000):
+        session.execute(insert(Chemical), rows[i:i + 5000])
+    print(f"生成 {amount} 条药品，建立索引耗时 {measure(lambda: rebuildSearchIndex(session)):.0f} ms")
+    session.commit()
+    print(f"{'查询':<10}{'LIKE ms':>10}{'LIKE 条数':>10}{'索引 ms':>10}{'索引 条数':>10}")
+    unmatched = []
+    for keyword in QUERIES:
+        likeTime = measure(lambda: likeSearch(keyword), REPEAT)
+        indexTime = measure(lambda: indexSearch(keyword), REPEAT)
+        indexCount = len(indexSearch(keyword))
+        print(f"{keyword:<10}{likeTime:>10.1f}{len(likeSearch(keyword)):>10}{indexTime:>10.1f}{indexCount:>10}")
+        if not indexCount:
+            unmatched.append(keyword)
+    if unmatched:
+        # 没有匹配行的查询只比较了两次空扫描，耗时没有参考意义
+        print("以下查询没有匹配任何药品，耗时不具参考意义：" + "、".join(unmatched))
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50000, sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,17 @@
+"""
+搜索倒排索引全量重建
+用法：在项目根目录执行 python -m searchIndexRebuild.main [实体类型]，上线索引或修改分词规则后执行一次
+"""
+import sys
+
+from models import session, rebuildSearchIndex
+
+
+def rebuild(entityType=None):
+    rebuildSearchIndex(session, entityType)
+    session.commit()
+    print("搜索索引重建完成！")
+
+
+if __name__ == "__main__":
+    rebuild(sys.argv[1] if len(sys.argv) > 1 else None)
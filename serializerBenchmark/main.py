@@ -0,0 +1,111 @@
+"""
+序列化基准：在临时库中生成药品、日志、研究成果，比较原手写 to_json（下面保留的副本）与生成的序列化函数
+（utils/serializers.py）连同 jsonify 的每秒行数
+用法：在项目根目录执行 python -m serializerBenchmark.main [每种行数]，默认每种 20000 行
+"""
+import sys
+from datetime import datetime, date, timedelta
+
+from robyn import jsonify
+from sqlalchemy import insert
+
+from models import session, userDirectory, User, Chemical, ChemicalTaker, Log, Accomplishment, LogAction, LogEntity
+from utils.benchmark import scratchDatabase, measure
+
+REPEAT = 5
+
+
+# 以下为改用生成的序列化函数之前的手写 to_json
+def legacyChemical(self):
+    data = {
+        "id": self.id,
+        "name": self.name,
+        "formula": self.formula,
+        "CAS": self.CAS,
+        "type": self.type,
+        "dangerLevel": self.dangerLevel,
+        "status": self.status,
+        "purity": self.purity,
+        "amount": self.amount,
+        "specification": self.specification,
+        "site": self.site,
+        "registerIds": self.registerIds,
+        "responsorId": self.responsorId,
+        "takerIds": self.takerIds,
+        "info": self.info,
+    }
+    return data
+
+
+def legacyLog(self):
+    data = {
+        "id": self.id,
+        "operatorId": self.operatorId,
+        "operatorName": userDirectory.username(self.operatorId),
+        "operation": self.operation,
+        "time": self.time,
+        "action": self.action,
+        "entityType": self.entityType,
+        "entityId": self.entityId,
+        "quantity": self.quantity,
+    }
+    return data
+
+
+def legacyAccomplishment(self):
+    data = {
+        "id": self.id,
+        "title": self.title,
+        "authorId": self.authorId,
+        "authorName": self.authorName,
+        "correspondingAuthorName": self.correspondingAuthorName,
+        "otherNames": self.otherNames,
+        "content": self.content,
+        "pic": self.pic,
+        "category": self.category,
+        "type": self.type,
+        "date": self.date,
+    }
+    return data
+
+
+def seed(amount):
+    session.add(User(id=1, username="基准", gender=1, role=2, usertype=6, hashedPassword=""))
+    session.flush()
+    now = datetime.now()
+    session.execute(insert(Chemical), [{
+        "name": f"药品{i}", "formula": f"C{i % 20}H{i % 30}", "CAS": f"{1000 + i}-{i % 90 + 10}-{i % 10}",
+        "type": 1 + i % 2, "dangerLevel": [1], "amount": i % 20, "purity": 0.99, "specification": "500g",
+        "site": "药品柜", "responsorId": 1
+    } for i in range(amount)])
+    session.execute(insert(ChemicalTaker), [{"chemicalId": i + 1, "userId": 1} for i in range(0, amount, 3)])
+    session.execute(insert(Log), [{
+        "operatorId": 1, "operation": f"领用药品：药品{i}", "time": now - timedelta(minutes=i),
+        "action": LogAction.TAKE, "entityType": LogEntity.CHEMICAL, "entityId": i + 1, "quantity": 1
+    } for i in range(amount)])
+    session.execute(insert(Accomplishment), [{
+        "title": f"研究成果{i}", "authorId": 1, "correspondingAuthorName": "通讯作者", "otherNames": "其他作者",
+        "content": "成果内容" * 20, "category": 1, "type": 1, "date": date(2020, 1, 1) + timedelta(days=i % 1500)
+    } for i in range(amount)])
+    session.commit()
+    userDirectory.get(1)
+
+
+def benchmark(amount=20000):
+    scratchDatabase()
+    seed(amount)
+    print("每秒行数：手写 to_json / 生成的序列化函数（仅转换为字典；连同 jsonify）")
+    for model, legacy in ((Chemical, legacyChemical), (Log, legacyLog), (Accomplishment, legacyAccomplishment)):
+        rows = model.listQuery().all()
+        # 两种方式输出的 JSON 须一致
+        assert jsonify([legacy(row) for row in rows]) == jsonify([model.to_json(row) for row in rows])
+        rates = []
+        for serialize in (legacy, model.to_json):
+            rates.append(amount * 1000 / measure(lambda: [serialize(row) for row in rows], REPEAT))
+            rates.append(amount * 1000 / measure(lambda: jsonify({"rows": [serialize(row) for row in rows]}), REPEAT))
+        print(f"{model.__name__}：仅字典 {rates[0]:.0f} / {rates[2]:.0f}，连同 jsonify {rates[1]:.0f} / {rates[3]:.0f}")
+        session.remove()
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
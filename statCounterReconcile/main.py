@@ -0,0 +1,17 @@
+"""
+统计计数器定时重算
+用法：在项目根目录执行 python -m statCounterReconcile.main，建议由 crontab 每天执行一次
+"""
+from models import session, reconcileCounters
+
+
+def reconcile():
+    result = reconcileCounters(session)
+    session.commit()
+    for tableName, counts in result.items():
+        print(tableName, counts)
+    print("计数器重算完成！")
+
+
+if __name__ == "__main__":
+    reconcile()
@@ -0,0 +1,100 @@
+"""
+不分页列表的内存检查：在临时库中分别生成较少与较多的日志和药品，用 tracemalloc 记录 getAllLogs、getChemicals
+不分页请求的峰值内存。响应体本身（及交给 Robyn 时必需的一次 bytes 复制）随行数线性增长，扣除后的峰值应与行数无关，
+该值随行数明显增长（一次性持有全部 ORM 对象、字典或 JSON 字符串）即以非零状态退出
+用法：在项目根目录执行 python -m streamMemoryCheck.main
+"""
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+import app  # 导入即注册全部接口（SessionRouter.postHandlers）
+from bluePrints.batch import BatchRequest
+from models import session, userDirectory, User, Chemical, Log, LogAction, LogEntity
+from utils.benchmark import scratchDatabase
+from utils.hooks import calcSignature, encode
+from utils.router import SessionRouter
+
+ROW_COUNTS = (5000, 20000)
+# 扣除响应体后的峰值内存允许的增长：MAX_GROWTH 倍再加 SLACK 字节（小数据量时峰值可能出现在逐块处理中途，基数很小）
+MAX_GROWTH = 1.5
+SLACK = 2 * 2 ** 20
+ADMIN_ID = 1
+STREAM_CALLS = {
+    "/extras/getAllLogs": {},
+    "/chemical/getChemicals": {"filterType": "0"},
+}
+
+
+def sessionid(userId):
+    return encode(f"userId={userId}&timestamp={int(time.time())}&signature={calcSignature(userId)}&algorithm=sha256")
+
+
+def seed(start, amount):
+    random.seed(start)
+    now = datetime.now()
+    session.execute(insert(Log), [{
+        "operatorId": ADMIN_ID,
+        "operation": f"领用药品：药品{i}，数量{random.randint(1, 20)}瓶",
+        "time": now - timedelta(minutes=i),
+        "action": LogAction.TAKE,
+        "entityType": LogEntity.CHEMICAL,
+        "entityId": i,
+    } for i in range(start, start + amount)])
+    session.execute(insert(Chemical), [{
+        "name": f"药品{i}",
+        "formula": f"C{i % 20}H{i % 30}O{i % 5}",
+        "CAS": f"{random.randint(1000, 99999)}-{random.randint(10, 99)}-{random.randint(0, 9)}",
+        "amount": random.randint(0, 20),
+        "dangerLevel": [],
+        "responsorId": ADMIN_ID,
+    } for i in range(start, start + amount)])
+    session.commit()
+    session.remove()
+
+
+async def measurePeaks():
+    peaks = {}
+    for path, data in STREAM_CALLS.items():
+        handler = SessionRouter.postHandlers[path]
+        # 先执行一次，排除语句编译缓存等一次性的内存分配
+        await handler(BatchRequest({**data, "sessionid": sessionid(ADMIN_ID)}, {}))
+        tracemalloc.start()
+        response = await handler(BatchRequest({**data, "sessionid": sessionid(ADMIN_ID)}, {}))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        bodySize = len(response.description)
+        peaks[path] = (peak, peak - 2 * bodySize)
+    return peaks
+
+
+def check():
+    scratchDatabase(withAsync=True)
+    session.add(User(id=ADMIN_ID, username="管理员", gender=1, role=2, usertype=6, hashedPassword=""))
+    session.commit()
+    userDirectory.get(ADMIN_ID)
+    results, seeded = [], 0
+    for rowCount in ROW_COUNTS:
+        seed(seeded, rowCount - seeded)
+        seeded = rowCount
+        results.append(asyncio.run(measurePeaks()))
+    failed = []
+    for path in STREAM_CALLS:
+        peaks = [result[path] for result in results]
+        print(f"{path}: " + "，".join(f"{rows}行 峰值{peak / 2 ** 20:.1f}MB（扣除响应体 {working / 2 ** 20:.1f}MB）"
+                                     for rows, (peak, working) in zip(ROW_COUNTS, peaks)))
+        if peaks[-1][1] > peaks[0][1] * MAX_GROWTH + SLACK:
+            failed.append(path)
+    if failed:
+        print("以下接口的峰值内存随行数增长：" + "、".join(failed))
+        sys.exit(1)
+    print("内存检查通过！")
+
+
+if __name__ == "__main__":
+    check()
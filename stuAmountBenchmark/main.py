@@ -0,0 +1,57 @@
+"""
+导师学生数统计基准：在临时库中生成合成用户，比较逐个导师 COUNT（User.stuAmount 属性）与
+一次 GROUP BY（User.stuAmounts）序列化全部用户的耗时与 SQL 语句数
+用法：在项目根目录执行 python -m stuAmountBenchmark.main [用户数] [数据库地址]，
+默认 3000 个用户（约十分之一为导师）、临时 SQLite 文件
+"""
+import random
+import sys
+
+from sqlalchemy import insert
+
+from models import session, User, Direction
+from utils.benchmark import scratchDatabase, measure, StatementCounter
+
+REPEAT = 5
+
+
+def seed(amount):
+    random.seed(0)
+    session.add(Direction(name="研究方向"))
+    supervisorCount = max(amount // 10, 1)
+    session.execute(insert(User), [{
+        "id": i, "username": f"导师{i}", "gender": 1, "role": 2, "usertype": 2, "hashedPassword": "", "directionId": 1
+    } for i in range(1, supervisorCount + 1)])
+    session.execute(insert(User), [{
+        "id": i, "username": f"学生{i}", "gender": 1, "role": 1, "usertype": 1, "hashedPassword": "", "directionId": 1,
+        "supervisorId": random.randint(1, supervisorCount)
+    } for i in range(supervisorCount + 1, amount + 1)])
+    session.commit()
+
+
+def perUserCount():
+    return [user.to_json() for user in User.listQuery().all()]
+
+
+def groupByCount():
+    users = User.listQuery().all()
+    stuAmounts = User.stuAmounts([user.id for user in users if user.role == 2])
+    return [user.to_json(stuAmounts) for user in users]
+
+
+def benchmark(amount=3000, url=None):
+    scratchDatabase(url)
+    seed(amount)
+    # 两种方式结果须一致
+    assert perUserCount() == groupByCount()
+    print(f"{amount} 个用户")
+    for name, serialize in (("逐个导师 COUNT", perUserCount), ("一次 GROUP BY", groupByCount)):
+        with StatementCounter() as counter:
+            serialize()
+        elapsed = measure(serialize, REPEAT)
+        print(f"{name}：{elapsed:.0f} ms，{counter.count} 条语句")
+        session.remove()
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3000, sys.argv[2] if len(sys.argv) > 2 else None)
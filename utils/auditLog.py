@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import event, insert
+
+import config
+from models import Session, session, engine, asyncEngine, Log
+
+# 缓冲的日志达到该条数立即批量写入，否则最多等待 AUDIT_LOG_FLUSH_MS 毫秒
+AUDIT_LOG_BATCH_SIZE = getattr(config, "AUDIT_LOG_BATCH_SIZE", 100)
+AUDIT_LOG_FLUSH_MS = getattr(config, "AUDIT_LOG_FLUSH_MS", 500)
+# 数据库不可用时内存中最多保留的日志条数，超出后丢弃最早的
+AUDIT_LOG_MAX_PENDING = getattr(config, "AUDIT_LOG_MAX_PENDING", 10000)
+# 会话 info 中暂存本事务日志的键
+PENDING_KEY = "auditLogs"
+
+
+class AuditLogWriter:
+    """
+    审计日志批量写入：请求中记录的日志在请求事务提交后进入内存缓冲（回滚则丢弃），
+    每 batchSize 条或每 flushInterval 秒用一条批量 INSERT 写入，不占用请求事务与响应时间
+    """
+
+    def __init__(self, batchSize=AUDIT_LOG_BATCH_SIZE, flushInterval=AUDIT_LOG_FLUSH_MS / 1000):
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self._buffer = []
+        self._timer = None
+        self._tasks = set()
+
+    def record(self, log, sync=False):
+        """
+        记录一条日志；sync=True 时随请求事务同步写入，用于重置密码、审核注册、删除等安全相关操作，
+        保证操作与日志同时提交
+        """
+        if sync:
+            session.add(log)
+            return
+        if log.time is None:
+            log.time = datetime.now()
+        row = {column.key: getattr(log, column.key) for column in Log.__table__.columns if column.key != "id"}
+        # 挂在当前事务上：事务未开始时先开始（不连接数据库），保证回滚时能丢弃
+        currentSession = session()
+        if not currentSession.in_transaction():
+            currentSession.begin()
+        currentSession.info.setdefault(PENDING_KEY, []).append(row)
+
+    def enqueue(self, rows):
+        self._buffer.extend(rows)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 脚本等没有事件循环的环境直接同步写入
+            self.flushSync()
+            return
+        if len(self._buffer) >= self.batchSize:
+            self._startFlush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flushInterval, self._startFlush, loop)
+
+    def _startFlush(self, loop):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        task = loop.create_task(self._write(rows))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, rows, retry=True):
+        try:
+            async with asyncEngine.begin() as connection:
+                await connection.execute(insert(Log), rows)
+        except Exception as e:
+            print("审计日志写入失败", e)
+            if not retry:
+                raise
+            # 放回缓冲区，下个周期重试
+            self._buffer[:0] = rows
+            del self._buffer[:-AUDIT_LOG_MAX_PENDING]
+            if self._timer is None:
+                loop = asyncio.get_running_loop()
+                self._timer = loop.call_later(self.flushInterval, self._startFlush, loop)
+
+    def flushSync(self):
+        rows, self._buffer = self._buffer, []
+        if rows:
+            with engine.begin() as connection:
+                connection.execute(insert(Log), rows)
+
+    async def flush(self):
+        """立即写入全部缓冲日志并等待进行中的写入完成（进程退出时调用）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        rows, self._buffer = self._buffer, []
+        if rows:
+            await self._write(rows, retry=False)
+
+    def stats(self):
+        return {
+            "pending": len(self._buffer),
+            "writing": len(self._tasks),
+        }
+
+
+auditLog = AuditLogWriter()
+
+
+@event.listens_for(Session, "after_commit")
+def publishAuditLogs(targetSession):
+    rows = targetSession.info.pop(PENDING_KEY, None)
+    if rows:
+        auditLog.enqueue(rows)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def discardAuditLogs(targetSession, previousTransaction):
+    targetSession.info.pop(PENDING_KEY, None)
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from models import Base, session, asyncSession
+
+
+def scratchDatabase(url=None, withAsync=False):
+    """
+    基准测试与检查脚本用的空数据库：建好全部表，并把请求级同步（withAsync=True 时含异步）会话绑定到该库，不触碰线上数据库
+    url 为空时使用临时 SQLite 文件；传入 MySQL 地址（须为空库）可得到与线上一致的执行计划与耗时
+    """
+    if url is None:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "scratch.db")
+    syncEngine = create_engine(url)
+    if syncEngine.dialect.name == "sqlite":
+        # 索引词均为小写：区分大小写的 LIKE 才能像 MySQL 一样对前缀匹配使用索引
+        event.listen(syncEngine, "connect", lambda connection, record: connection.execute(
+            "PRAGMA case_sensitive_like = ON"))
+    Base.metadata.create_all(syncEngine)
+    session.remove()
+    session.configure(bind=syncEngine)
+    if withAsync:
+        asyncUrl = url.replace("sqlite://", "sqlite+aiosqlite://").replace("mysql+pymysql://", "mysql+aiomysql://")
+        asyncSession.configure(bind=create_async_engine(asyncUrl, poolclass=NullPool))
+    return syncEngine
+
+
+class StatementCounter:
+    """统计执行的 SQL 语句数（所有引擎，含异步引擎）：with StatementCounter() as counter: ... 之后读取 counter.count"""
+
+    def __init__(self):
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(Engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "before_cursor_execute", self._count)
+
+
+# 执行 repeat 次，返回平均每次耗时（毫秒）
+def measure(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
@@ -1,19 +1,40 @@
 import base64
+import functools
 import hashlib
 import hmac
+import json
 import os
 import re
 import string
 import time
+from collections import OrderedDict
+from contextvars import ContextVar
 import pandas as pd
 import yagmail
 import random
 
 from dateutil import parser
+from robyn import jsonify, Response, Headers
 from sqlalchemy import extract
 
 from config import LOGIN_SECRET, EMAIL_ADDRESS, EMAIL_PWD, EMAIL_HOST
-from models import session, User, Accomplishment
+from models import session, userDirectory, User, Accomplishment, TableVersion
+from utils.pagination import InvalidPage
+from utils.projection import InvalidFields
+
+# sessionid有效期：3小时
+SESSION_TTL = 10800
+# 必须用()包含住捕获组才能被match.group捕获
+SESSIONID_PATTERN = re.compile(r"^userId=(\d+)&timestamp=(\d+)&signature=(.+)&algorithm=sha256$")
+CHINESE_YEAR_MONTH_PATTERN = re.compile(r'(\d{4})年(\d{1,2})月')
+CHINESE_YEAR_PATTERN = re.compile(r'(\d{4})年')
+# 当前请求的请求体及已登录用户（由 loginRequired 设置）
+requestData = ContextVar("requestData", default=None)
+currentUser = ContextVar("currentUser", default=None)
+# 批量请求中已认证的用户id（由 /batch 设置），子请求不再重复校验sessionid
+batchUser = ContextVar("batchUser", default=None)
+# 当前列表接口所在表的版本号（由 versioned 设置）
+tableVersion = ContextVar("tableVersion", default=None)
 
 
 def encode(inputString):
@@ -48,12 +69,56 @@ def checkSignature(signature, message):
     return hmac.compare_digest(signature, correctSig)
 
 
+class VerifiedSessionCache:
+    """已验证sessionid的有界缓存：条目在token过期时刻失效，超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, maxSize=4096):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # sessionid -> (result, expiresAt)
+
+    def get(self, sessionid):
+        entry = self._entries.get(sessionid)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, expiresAt = entry
+        if time.time() > expiresAt:
+            del self._entries[sessionid]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(sessionid)
+        self.hits += 1
+        return result
+
+    def put(self, sessionid, result, expiresAt):
+        self._entries[sessionid] = (result, expiresAt)
+        self._entries.move_to_end(sessionid)
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+
+verifiedSessions = VerifiedSessionCache()
+
+
 def checkSessionid(sessionid):
+    if not sessionid:
+        return None
+    cached = verifiedSessions.get(sessionid)
+    if cached:
+        return cached
     decodedSessionid = decode(sessionid)
     if not decodedSessionid:
         return None
-    pattern = rf"^userId=(\d+)&timestamp=(\d+)&signature=(.+)&algorithm=sha256$"  # 必须用()包含住捕获组才能被match.group捕获
-    match = re.match(pattern, decodedSessionid)
+    match = SESSIONID_PATTERN.match(decodedSessionid)
     if not match:
         return None
     userId = match.group(1)
@@ -61,16 +126,18 @@ def checkSessionid(sessionid):
     signature = match.group(3)
     if not checkSignature(signature, userId):  # 签名无效
         return None
-    if time.time() - float(timestamp) > 10800:  # 3小时有效
+    expiresAt = float(timestamp) + SESSION_TTL
+    if time.time() > expiresAt:
         return None
-    return {
+    result = {
         "userId": int(userId),
         "timestamp": timestamp
     }
+    verifiedSessions.put(sessionid, result, expiresAt)
+    return result
 
 
-def checkUserAuthority(userId, operationLevel="adminOnly"):
-    user = session.query(User).get(userId)
+def checkUserAuthority(user, operationLevel="adminOnly"):
     usertype = user.usertype
     if operationLevel == "adminOnly":
         return usertype == 2 or usertype == 6
@@ -80,6 +147,124 @@ def checkUserAuthority(userId, operationLevel="adminOnly"):
         return True
 
 
+def loginRequired(operationLevel=None, unauthorizedMessage="用户无权限", forbiddenStatus=-2,
+                  forbiddenMessage="权限不足", fromHeaders=False):
+    """
+    登录校验装饰器：校验sessionid、加载一次当前用户并按 operationLevel（adminOnly / superAdminOnly）校验权限
+    处理函数中通过 requestData.get() 获取请求体（fromHeaders=True 时为请求头），currentUser.get() 获取当前用户
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            data = request.headers if fromHeaders else request.json()
+            authenticatedId = batchUser.get()
+            if authenticatedId is not None:
+                # 每个子请求重新加载用户：前面的子请求可能已修改用户名、密码等
+                user = session.get(User, authenticatedId)
+            else:
+                res = checkSessionid(data.get("sessionid"))
+                user = session.get(User, res["userId"]) if res else None
+            if not user:
+                return jsonify({
+                    "status": -1,
+                    "message": unauthorizedMessage
+                })
+            if operationLevel and not checkUserAuthority(user, operationLevel):
+                return jsonify({
+                    "status": forbiddenStatus,
+                    "message": forbiddenMessage
+                })
+            dataToken, userToken = requestData.set(data), currentUser.set(user)
+            try:
+                return await handler(request)
+            finally:
+                requestData.reset(dataToken)
+                currentUser.reset(userToken)
+
+        return wrapper
+
+    return decorator
+
+
+def listParams(handler):
+    """列表、搜索接口装饰器，放在 loginRequired 之下：limit、cursor、fields 格式错误时返回 status -1，而不是服务器错误"""
+
+    @functools.wraps(handler)
+    async def wrapper(request):
+        try:
+            return await handler(request)
+        except (InvalidPage, InvalidFields) as e:
+            return jsonify({
+                "status": -1,
+                "message": str(e)
+            })
+
+    return wrapper
+
+
+# 不属于查询条件的请求参数：会话及客户端带回的版本号
+NON_QUERY_PARAMS = ("sessionid", "version")
+
+
+# 请求体中的查询条件（筛选、字段集、分页参数等），序列化为键有序的 JSON 字符串
+def queryParams(data):
+    params = {name: value for name, value in data.items() if name not in NON_QUERY_PARAMS}
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+async def readTableVersions(tableNames):
+    """
+    一次查询读取多张表的版本号（表名 -> 版本号），同时读取 user 表版本号并据此同步用户目录：
+    其他进程改了用户名等之后，本请求生成的列表不会用旧的用户名，却带上新的版本号
+    """
+    versions = await TableVersion.readMany((*tableNames, "user"))
+    userDirectory.sync(versions.get("user"))
+    return versions
+
+
+def versioned(tableName):
+    """
+    轮询列表接口的条件响应，放在 loginRequired 之下：客户端在请求体中带上次响应的 version（或在请求头 If-None-Match
+    中带上次的 ETag）且与当前版本相同时，直接返回“未变化”，不再查询和序列化列表；
+    否则照常处理，响应带 ETag 头，处理函数通过 tableVersion.get() 在响应体中返回版本
+    版本为“表版本号-查询条件摘要”：筛选条件、字段集或分页参数不同的请求，版本也不同
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            # 先于列表数据读取：其间有写入时客户端下次会多拉取一次，不会漏掉变化
+            tableVersionNumber = (await readTableVersions((tableName,))).get(tableName)
+            if tableVersionNumber is None:
+                return await handler(request)
+            digest = hashlib.sha1(queryParams(requestData.get()).encode("utf-8")).hexdigest()[:12]
+            version = f"{tableVersionNumber}-{digest}"
+            etag = f'"{tableName}-{version}"'
+            clientVersion = requestData.get().get("version")
+            if str(clientVersion) == version or request.headers.get("If-None-Match") == etag:
+                response = jsonify({
+                    "status": 304,
+                    "message": "数据未变化",
+                    "version": version
+                })
+            else:
+                token = tableVersion.set(version)
+                try:
+                    response = await handler(request)
+                finally:
+                    tableVersion.reset(token)
+            if not isinstance(response, Response):
+                response = Response(status_code=200, headers=Headers({"Content-Type": "application/json"}),
+                                    description=response)
+            response.headers.set("ETag", etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
 def sendEmail(to, subject=None, content=None):
     yag = yagmail.SMTP(EMAIL_ADDRESS, EMAIL_PWD, host=EMAIL_HOST)
     yag.send(to, subject, content)
@@ -141,7 +326,7 @@ def generateAccompXlsx(accomps, year=None):
 
 
 def parse_chinese_year_month(s: str):
-    match = re.fullmatch(r'(\d{4})年(\d{1,2})月', s.strip())
+    match = CHINESE_YEAR_MONTH_PATTERN.fullmatch(s.strip())
     if not match:
         return None
     iso_str = f"{match.group(1)}-{match.group(2)}"
@@ -149,7 +334,7 @@ def parse_chinese_year_month(s: str):
 
 
 def parse_chinese_year(s: str):
-    match = re.fullmatch(r'(\d{4})年', s.strip())
+    match = CHINESE_YEAR_PATTERN.fullmatch(s.strip())
     if not match:
         return None
     return int(match.group(1))
\ No newline at end of file
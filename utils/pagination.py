@@ -0,0 +1,117 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+# 只传 cursor 未传 limit 时的默认页大小
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# 全量导出类请求分块读取时每块的行数
+STREAM_CHUNK_SIZE = 500
+
+
+def encodeCursor(values):
+    values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode()
+
+
+class InvalidPage(ValueError):
+    """请求中的 limit 或 cursor 格式错误"""
+
+
+def decodeCursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidPage("cursor 格式错误")
+
+
+class KeysetPage:
+    """
+    游标（keyset）分页：按 (排序列, 主键) 排序，游标为上一页最后一行的 (排序值, 主键)
+    请求体中 limit、cursor 都未传时不分页，兼容旧版小程序；排序列可为空，NULL 视为最小值（与 MySQL 一致）
+    """
+
+    def __init__(self, data, sortColumn, idColumn, descending=False, maxLimit=MAX_PAGE_SIZE):
+        self.sortColumn = sortColumn if sortColumn is not idColumn else None
+        self.idColumn = idColumn
+        self.descending = descending
+        limit, cursor = data.get("limit"), data.get("cursor")
+        self.paginated = bool(limit or cursor)
+        try:
+            self.limit = min(max(int(limit), 1), maxLimit) if limit else DEFAULT_PAGE_SIZE
+        except (ValueError, TypeError):
+            raise InvalidPage("limit 格式错误")
+        self.after = self._parseCursor(cursor) if cursor else None
+
+    # 解码并校验游标：[排序值, 主键]（按主键排序时只有主键），日期类排序值转回日期
+    def _parseCursor(self, cursor):
+        after = decodeCursor(cursor)
+        length = 1 if self.sortColumn is None else 2
+        if not isinstance(after, list) or len(after) != length or not isinstance(after[-1], int):
+            raise InvalidPage("cursor 格式错误")
+        if self.sortColumn is not None and after[0] is not None:
+            pythonType = self.sortColumn.type.python_type
+            try:
+                if pythonType in (date, datetime):
+                    after[0] = pythonType.fromisoformat(after[0])
+                elif not isinstance(after[0], pythonType):
+                    raise TypeError
+            except (ValueError, TypeError):
+                raise InvalidPage("cursor 格式错误")
+        return after
+
+    def _afterClause(self):
+        afterId = self.after[-1]
+        idClause = self.idColumn < afterId if self.descending else self.idColumn > afterId
+        if self.sortColumn is None:
+            return idClause
+        sortValue = self.after[0]
+        sortColumn = self.sortColumn
+        if sortValue is None:
+            # 升序时 NULL 在前，之后是同为 NULL 的剩余行及全部非 NULL 行；降序时 NULL 在最后
+            if self.descending:
+                return and_(sortColumn.is_(None), idClause)
+            return or_(and_(sortColumn.is_(None), idClause), sortColumn.isnot(None))
+        beyond = sortColumn < sortValue if self.descending else sortColumn > sortValue
+        clause = or_(beyond, and_(sortColumn == sortValue, idClause))
+        if self.descending:
+            return or_(sortColumn.is_(None), clause)
+        return and_(sortColumn.isnot(None), clause)
+
+    # query 可以是 Query 或 select()；不要预先 order_by，排序由这里统一追加
+    def apply(self, query):
+        columns = [self.sortColumn, self.idColumn] if self.sortColumn is not None else [self.idColumn]
+        query = query.order_by(*[column.desc() if self.descending else column for column in columns])
+        if not self.paginated:
+            return query
+        if self.after is not None:
+            query = query.where(self._afterClause())
+        # 多取一行判断是否还有下一页
+        return query.limit(self.limit + 1)
+
+    # 返回 (本页数据, nextCursor)，没有下一页或不分页时 nextCursor 为 None
+    def split(self, rows):
+        if not self.paginated or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        last = rows[-1]
+        values = [getattr(last, self.idColumn.key)]
+        if self.sortColumn is not None:
+            values.insert(0, getattr(last, self.sortColumn.key))
+        return rows, encodeCursor(values)
+
+
+def keysetChunks(query, sortColumn, idColumn, descending=False, chunkSize=STREAM_CHUNK_SIZE):
+    """
+    按 (排序列, 主键) 游标分块读取查询的全部结果，每块一条走索引的有界查询，上一块的对象随即可被回收
+    不使用 yield_per：其服务端游标（MySQL 非缓冲游标）与 selectinload 的附加查询不能共用一个连接
+    """
+    cursor = None
+    while True:
+        page = KeysetPage({"limit": chunkSize, "cursor": cursor}, sortColumn, idColumn, descending, maxLimit=chunkSize)
+        rows, cursor = page.split(page.apply(query).all())
+        yield from rows
+        if cursor is None:
+            return
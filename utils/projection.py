@@ -0,0 +1,53 @@
+import json
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+from utils.serializers import serializer
+
+
+class InvalidFields(ValueError):
+    """请求中的 fields 格式错误"""
+
+
+def requestedFields(model, data):
+    """
+    解析列表接口请求的字段集：fields（列表、JSON 数组或逗号分隔字符串）优先，其次 profile（brief/full）
+    都未传时返回 None，表示沿用 to_json 的完整输出；未知字段忽略
+    模型通过 FIELD_PROFILES 声明命名字段集（full 即全部可选字段），FIELD_COLUMNS 声明派生字段依赖的列
+    """
+    fields = data.get("fields")
+    if fields:
+        try:
+            if isinstance(fields, str):
+                fields = json.loads(fields) if fields.startswith("[") else fields.split(",")
+            fields = [field.strip() for field in fields]
+        except (ValueError, TypeError, AttributeError):
+            raise InvalidFields("fields 格式错误")
+        allowed = model.FIELD_PROFILES["full"]
+        return tuple(field for field in allowed if field in fields) or None
+    profile = data.get("profile")
+    if profile and profile != "full":
+        return model.FIELD_PROFILES.get(profile)
+    return None
+
+
+# 只查询字段集用到的列，其余列（尤其是 Text 列）不会被取回；主键与 keyset 排序列总是查询
+def projectQuery(query, model, fields):
+    if fields is None:
+        return query
+    mapper = inspect(model)
+    columnNames = {attr.key for attr in mapper.column_attrs}
+    columns = {column for field in fields for column in model.FIELD_COLUMNS.get(field, (field,))}
+    columns.update(mapper.get_property_by_column(column).key for column in mapper.primary_key)
+    columns.update(getattr(model, "SORT_COLUMNS", ()))
+    return query.options(load_only(*[getattr(model, column) for column in columns if column in columnNames]))
+
+
+# values 用于覆盖需在外部批量计算的字段（如学生数），这些字段不再从对象上读取
+def project(obj, fields, **values):
+    if fields is None:
+        return obj.to_json()
+    data = serializer(type(obj), tuple(field for field in fields if field not in values))(obj)
+    data.update((field, values[field]) for field in fields if field in values)
+    return data
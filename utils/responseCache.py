@@ -0,0 +1,129 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+
+import config
+from utils.hooks import requestData, queryParams, readTableVersions
+from utils.router import scopedSession
+
+# 缓存的响应在 RESPONSE_CACHE_TTL 秒内直接返回；之后 RESPONSE_CACHE_STALE_TTL 秒内先返回旧响应并在后台刷新
+RESPONSE_CACHE_TTL = getattr(config, "RESPONSE_CACHE_TTL", 300)
+RESPONSE_CACHE_STALE_TTL = getattr(config, "RESPONSE_CACHE_STALE_TTL", 600)
+RESPONSE_CACHE_SIZE = getattr(config, "RESPONSE_CACHE_SIZE", 1024)
+
+
+class CacheEntry:
+    __slots__ = ("response", "versions", "freshUntil", "staleUntil")
+
+    def __init__(self, response, versions, freshUntil, staleUntil):
+        self.response = response
+        self.versions = versions
+        self.freshUntil = freshUntil
+        self.staleUntil = staleUntil
+
+
+class ResponseCache:
+    """
+    进程内响应缓存，超出容量时淘汰最久未使用的条目
+    每个条目记下生成响应前读取的表版本号（table_version，写入时在同一事务中加一），命中时与当前版本号比较，
+    不同则作废：任一工作进程的写入都能让所有进程的缓存立即失效
+    """
+
+    def __init__(self, maxSize=RESPONSE_CACHE_SIZE):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.staleHits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> CacheEntry
+        self._refreshing = set()
+
+    def get(self, key, versions):
+        entry = self._entries.get(key)
+        if entry is not None and (entry.versions != versions or time.monotonic() > entry.staleUntil):
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, response, versions, ttl, staleTtl):
+        now = time.monotonic()
+        self._entries[key] = CacheEntry(response, versions, now + ttl, now + ttl + staleTtl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "staleHits": self.staleHits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+
+responseCache = ResponseCache()
+
+
+# 缓存键：处理函数 + 请求体中的查询条件（不含 sessionid、version，version 由外层的 versioned 处理）
+def cacheKey(handler, request):
+    data = requestData.get()
+    if data is None:
+        try:
+            data = request.json()
+        except Exception:
+            data = {}
+    return handler.__module__, handler.__qualname__, queryParams(data)
+
+
+# 读取缓存依赖的表版本号（同时同步用户目录，见 readTableVersions）
+async def readVersions(tableNames):
+    versions = await readTableVersions(tableNames)
+    return tuple(versions.get(tableName) for tableName in tableNames)
+
+
+def cached(*tableNames, ttl=RESPONSE_CACHE_TTL, staleTtl=RESPONSE_CACHE_STALE_TTL):
+    """
+    参考数据类接口的响应缓存，放在 loginRequired、versioned 之下（不缓存“未变化”响应）：
+    响应依赖的表版本号未变且未过期时直接返回，不查询和序列化数据（只读一次版本号）；
+    过期后 staleTtl 秒内先返回旧响应，同时在后台（独立的请求级会话中）刷新；表尚无版本行时不缓存
+    """
+
+    def decorator(handler):
+        # versions 须在读取数据之前读取：其间有写入时条目带旧版本号，下次命中时即作废
+        async def load(key, request, versions):
+            response = await handler(request)
+            if None not in versions:
+                responseCache.put(key, response, versions, ttl, staleTtl)
+            return response
+
+        async def refresh(key, request, versions):
+            try:
+                await scopedSession(load)(key, request, versions)
+            except Exception as e:
+                print("缓存刷新失败", e)
+            finally:
+                responseCache._refreshing.discard(key)
+
+        @functools.wraps(handler)
+        async def wrapper(request):
+            key = cacheKey(handler, request)
+            versions = await readVersions(tableNames)
+            entry = responseCache.get(key, versions)
+            if entry is None:
+                return await load(key, request, versions)
+            if time.monotonic() <= entry.freshUntil:
+                responseCache.hits += 1
+            else:
+                responseCache.staleHits += 1
+                if key not in responseCache._refreshing:
+                    responseCache._refreshing.add(key)
+                    asyncio.get_running_loop().create_task(refresh(key, request, versions))
+            return entry.response
+
+        return wrapper
+
+    return decorator
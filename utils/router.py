@@ -0,0 +1,45 @@
+import functools
+
+from robyn import SubRouter, HttpMethod
+
+from models import session, asyncSession, requestScope
+
+
+def scopedSession(handler):
+    """为处理函数开启请求级数据库会话（同步/异步）：首次使用时创建，正常结束提交，异常回滚，最后关闭"""
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        token = requestScope.set(object())
+        try:
+            response = await handler(*args, **kwargs)
+            if session.registry.has():
+                session.commit()
+            if asyncSession.registry.has():
+                await asyncSession.commit()
+            return response
+        except Exception:
+            if session.registry.has():
+                session.rollback()
+            if asyncSession.registry.has():
+                await asyncSession.rollback()
+            raise
+        finally:
+            session.remove()
+            await asyncSession.remove()
+            requestScope.reset(token)
+
+    return wrapper
+
+
+class SessionRouter(SubRouter):
+    """注册到该路由的处理函数自动使用请求级会话，避免所有并发请求共用一个全局会话"""
+
+    # 所有 POST 接口：完整路径 -> 处理函数，供 /batch 批量调用
+    postHandlers = {}
+
+    def add_route(self, route_type, endpoint, handler, *args, **kwargs):
+        handler = scopedSession(handler)
+        if route_type == HttpMethod.POST:
+            SessionRouter.postHandlers[endpoint] = handler
+        return super().add_route(route_type, endpoint, handler, *args, **kwargs)
@@ -0,0 +1,94 @@
+import re
+
+from pypinyin import lazy_pinyin, Style
+
+# 索引词最大长度（与 search_token.token 列一致）
+MAX_TOKEN_LENGTH = 60
+CJK_RUN_PATTERN = re.compile(r"[一-鿿]+")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# 化学式中的元素符号，如 NaCl -> Na、Cl
+ELEMENT_PATTERN = re.compile(r"[A-Z][a-z]?")
+CAS_DIGITS_PATTERN = re.compile(r"[\d-]+")
+
+
+def cjkTokens(text):
+    """汉字单字与相邻二元组：单字用于一个字的查询，二元组用于多字查询"""
+    tokens = set()
+    for run in CJK_RUN_PATTERN.findall(text or ""):
+        tokens.update(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def wordTokens(text):
+    return set(WORD_PATTERN.findall((text or "").lower()))
+
+
+def pinyinInitials(text):
+    """汉字串的拼音首字母，如 氯化钠 -> lhn"""
+    runs = CJK_RUN_PATTERN.findall(text or "")
+    return {"".join(lazy_pinyin(run, style=Style.FIRST_LETTER)) for run in runs}
+
+
+def formulaTokens(formula):
+    if not formula:
+        return set()
+    tokens = wordTokens(formula)
+    tokens.add(re.sub(r"[^0-9a-z]", "", formula.lower()))
+    tokens.update(element.lower() for element in ELEMENT_PATTERN.findall(formula))
+    tokens.discard("")
+    return tokens
+
+
+# CAS号去掉连字符索引，如 7647-14-5 -> 7647145
+def casTokens(cas):
+    if not cas:
+        return set()
+    return {cas.strip().replace("-", "")}
+
+
+def weighted(*groups):
+    """合并 (词集合, 权重) 列表，同一个词取最高权重"""
+    result = {}
+    for tokens, weight in groups:
+        for token in tokens:
+            token = token[:MAX_TOKEN_LENGTH]
+            result[token] = max(result.get(token, 0), weight)
+    return result
+
+
+def chemicalTokens(name, formula, CAS):
+    return weighted(
+        (cjkTokens(name), 3),
+        (wordTokens(name), 3),
+        (casTokens(CAS), 3),
+        (formulaTokens(formula), 2),
+        (pinyinInitials(name), 1),
+    )
+
+
+def accomplishmentTokens(title, content, authorNames):
+    """标题、作者（第一作者、通讯作者、其他作者）权重高于正文"""
+    authorTokens = set()
+    for name in authorNames:
+        authorTokens |= cjkTokens(name) | wordTokens(name)
+    return weighted(
+        (cjkTokens(title) | wordTokens(title), 3),
+        (cjkTokens(content) | wordTokens(content), 1),
+        (authorTokens, 3),
+    )
+
+
+def queryTerms(text):
+    """
+    拆分查询串，返回 (精确匹配词, 前缀匹配词)
+    汉字按索引规则拆成单字/二元组精确匹配；字母数字串（化学式、CAS、拼音首字母）按前缀匹配，支持边输入边搜索
+    """
+    text = (text or "").strip()
+    exact = set()
+    for run in CJK_RUN_PATTERN.findall(text):
+        exact.update(run if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+    # CAS号（可能只输入了一部分）按去掉连字符的数字串前缀匹配
+    if CAS_DIGITS_PATTERN.fullmatch(text) and "-" in text:
+        return exact, {text.replace("-", "")}
+    return exact, wordTokens(text)
@@ -0,0 +1,18 @@
+import orjson
+from robyn import Response, Headers
+
+
+def streamJson(envelope, key, rows, serialize):
+    """
+    把 rows 逐行序列化后直接写入响应体，结果与 jsonify({**envelope, key: [serialize(row) ...]}) 相同
+    rows 应为分块读取的迭代器（见 utils.pagination.keysetChunks），内存中只有当前一块对象和已序列化的字节，
+    不再同时持有 ORM 对象列表、字典列表和 JSON 字符串三份全量数据
+    """
+    body = bytearray(orjson.dumps({key: []})[:-2])
+    for index, row in enumerate(rows):
+        if index:
+            body += b","
+        body += orjson.dumps(serialize(row))
+    body += b"]"
+    body += b"," + orjson.dumps(envelope)[1:] if envelope else b"}"
+    return Response(status_code=200, headers=Headers({"Content-Type": "application/json"}), description=bytes(body))
@@ -0,0 +1,158 @@
+import asyncio
+import fcntl
+import json
+import os
+import stat
+import tempfile
+import time
+
+import aiohttp
+
+import config
+
+WX_API_BASE = getattr(config, "WX_API_BASE", "https://api.weixin.qq.com")
+# access_token在过期前提前刷新的秒数
+TOKEN_REFRESH_MARGIN = 300
+# access_token缓存文件（同一台机器上的所有worker进程共享），放在仅当前用户可访问的目录中
+TOKEN_CACHE_DIR = getattr(config, "WX_TOKEN_CACHE_DIR", os.path.join(tempfile.gettempdir(), f"be-ccu-{os.getuid()}"))
+TOKEN_CACHE_PATH = os.path.join(TOKEN_CACHE_DIR, "wx-access-token.json")
+TOKEN_LOCK_PATH = TOKEN_CACHE_PATH + ".lock"
+
+
+# 创建缓存目录（权限 0700）；目录已存在时须为当前用户所有的真实目录，防止他人预先创建或用符号链接劫持
+def _ensureCacheDir():
+    os.makedirs(TOKEN_CACHE_DIR, mode=0o700, exist_ok=True)
+    status = os.lstat(TOKEN_CACHE_DIR)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid():
+        raise PermissionError(f"access_token缓存目录不安全：{TOKEN_CACHE_DIR}")
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        os.chmod(TOKEN_CACHE_DIR, 0o700)
+
+
+class WxClient:
+    """微信服务端API异步客户端：复用keep-alive连接池，带超时；access_token跨进程缓存并单飞刷新"""
+
+    def __init__(self, appid, secret, baseUrl=WX_API_BASE, timeout=5, poolSize=20):
+        self.appid = appid
+        self.secret = secret
+        self.baseUrl = baseUrl
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.poolSize = poolSize
+        self._session = None
+        self._token = None
+        self._tokenExpiresAt = 0
+        self._refreshLock = None
+
+    # ClientSession须在事件循环中创建，故延迟到首次请求
+    def _getSession(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.poolSize, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(base_url=self.baseUrl, connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def _get(self, path, params):
+        async with self._getSession().get(path, params=params) as response:
+            return await response.json(content_type=None)
+
+    def _readCachedToken(self):
+        if self._token and time.time() < self._tokenExpiresAt:
+            return self._token
+        try:
+            with open(TOKEN_CACHE_PATH, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("appid") != self.appid or time.time() >= cached.get("expiresAt", 0):
+            return None
+        self._token, self._tokenExpiresAt = cached["accessToken"], cached["expiresAt"]
+        return self._token
+
+    def _writeCachedToken(self, token, expiresAt):
+        self._token, self._tokenExpiresAt = token, expiresAt
+        tempPath = f"{TOKEN_CACHE_PATH}.{os.getpid()}"
+        try:
+            os.remove(tempPath)
+        except FileNotFoundError:
+            pass
+        # 仅所有者可读写；O_EXCL、O_NOFOLLOW 保证写入的是新建的文件而不是已有文件或符号链接
+        fd = os.open(tempPath, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"appid": self.appid, "accessToken": token, "expiresAt": expiresAt}, f)
+        os.replace(tempPath, TOKEN_CACHE_PATH)
+
+    @staticmethod
+    async def _acquireFileLock(lockFile):
+        while True:
+            try:
+                fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(0.05)
+
+    async def getAccessToken(self):
+        token = self._readCachedToken()
+        if token:
+            return token
+        if self._refreshLock is None:
+            self._refreshLock = asyncio.Lock()
+        # 进程内单飞
+        async with self._refreshLock:
+            token = self._readCachedToken()
+            if token:
+                return token
+            # 跨进程单飞：拿到文件锁后再检查一次，其他worker可能已刷新
+            _ensureCacheDir()
+            lockFd = os.open(TOKEN_LOCK_PATH, os.O_WRONLY | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+            with os.fdopen(lockFd, "w") as lockFile:
+                await self._acquireFileLock(lockFile)
+                try:
+                    token = self._readCachedToken()
+                    if token:
+                        return token
+                    data = await self._get("/cgi-bin/token", {
+                        "grant_type": "client_credential",
+                        "appid": self.appid,
+                        "secret": self.secret,
+                    })
+                    token = data.get("access_token")
+                    if token:
+                        expiresIn = int(data.get("expires_in", 7200))
+                        self._writeCachedToken(token, time.time() + expiresIn - TOKEN_REFRESH_MARGIN)
+                    return token
+                finally:
+                    fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    # access_token被微信判定失效时（errcode 40001/42001）丢弃缓存
+    def invalidateAccessToken(self, token):
+        if self._token == token:
+            self._token, self._tokenExpiresAt = None, 0
+        try:
+            with open(TOKEN_CACHE_PATH, "r") as f:
+                cached = json.load(f)
+            if cached.get("accessToken") == token:
+                os.remove(TOKEN_CACHE_PATH)
+        except (OSError, ValueError):
+            pass
+
+    async def code2Session(self, jsCode):
+        return await self._get("/sns/jscode2session", {
+            "appid": self.appid,
+            "secret": self.secret,
+            "js_code": jsCode,
+            "grant_type": "authorization_code",
+        })
+
+    async def checkSession(self, accessToken, openid, signature):
+        return await self._get("/wxa/checksession", {
+            "access_token": accessToken,
+            "openid": openid,
+            "signature": signature,
+            "sig_method": "hmac_sha256",
+        })
+
+
+wxClient = WxClient(config.APPID, config.APPSECRET)
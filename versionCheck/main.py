@@ -0,0 +1,92 @@
+"""
+条件响应检查：在临时库中生成药品和设备，带上次响应的 version 调用轮询列表接口。
+以下情况应返回数据，而不是“未变化”：
+- 更换筛选条件、字段集或分页游标；
+- 其他进程修改了负责人的用户名，此时还应返回新的用户名。
+只有相同的请求带回相同的 version 时才应返回 304，否则以非零状态退出
+用法：在项目根目录执行 python -m versionCheck.main
+"""
+import asyncio
+import json
+import sys
+import time
+
+from sqlalchemy import insert
+
+import app  # 导入即注册全部接口（SessionRouter.postHandlers）
+from bluePrints.batch import BatchRequest
+from models import session, User, Chemical, Equipment, TableVersion
+from utils.benchmark import scratchDatabase
+from utils.hooks import calcSignature, encode
+from utils.router import SessionRouter
+
+ADMIN_ID = 1
+# (说明, 接口, 首次请求, 带回 version 的第二次请求（None 表示下一页）, 列表字段)
+CASES = [
+    ("更换筛选条件", "/chemical/getChemicals", {"filterType": "1"}, {"filterType": "2"}, "chemicals"),
+    ("药品下一页", "/chemical/getChemicals", {"filterType": "0", "limit": 2}, None, "chemicals"),
+    ("更换字段集", "/chemical/getChemicals", {"filterType": "0", "fields": "name"},
+     {"filterType": "0", "fields": "name,formula"}, "chemicals"),
+    ("设备下一页", "/equipment/getEquipments", {"limit": 1}, None, "equipments"),
+]
+
+
+def sessionid(userId):
+    return encode(f"userId={userId}&timestamp={int(time.time())}&signature={calcSignature(userId)}&algorithm=sha256")
+
+
+async def call(path, data):
+    response = await SessionRouter.postHandlers[path](BatchRequest({**data, "sessionid": sessionid(ADMIN_ID)}, {}))
+    return json.loads(response.description)
+
+
+def seed():
+    session.execute(insert(TableVersion), [{"tableName": name, "version": 1} for name in ("chemical", "equipment", "user")])
+    session.add(User(id=ADMIN_ID, username="管理员", gender=1, role=2, usertype=6, hashedPassword=""))
+    session.flush()
+    session.add_all([Chemical(name=f"药品{i}", formula=f"F{i}", amount=1, type=1 + i % 2, dangerLevel=[],
+                              responsorId=ADMIN_ID) for i in range(6)])
+    session.add_all([Equipment(name=f"设备{i}", responsorId=ADMIN_ID) for i in range(3)])
+    session.commit()
+    session.remove()
+
+
+async def checkCases():
+    failed = []
+    for name, path, first, second, listKey in CASES:
+        result = await call(path, first)
+        if second is None:
+            second = {**first, "cursor": result["nextCursor"]}
+        changed = await call(path, {**second, "version": result["version"]})
+        same = await call(path, {**first, "version": result["version"]})
+        print(f"{name}: 第二次请求 status {changed['status']}，{len(changed.get(listKey) or [])} 条；"
+              f"相同请求 status {same['status']}")
+        if changed["status"] == 304 or not changed.get(listKey) or same["status"] != 304:
+            failed.append(name)
+    return failed
+
+
+async def checkRename():
+    result = await call("/equipment/getEquipments", {})
+    # 直接改库，模拟其他进程修改用户名（本进程的用户目录未被 invalidate）
+    session.get(User, ADMIN_ID).username = "新管理员"
+    session.commit()
+    session.remove()
+    renamed = await call("/equipment/getEquipments", {"version": result["version"]})
+    names = {equipment["responsorName"] for equipment in renamed.get("equipments") or []}
+    print(f"修改负责人用户名: status {renamed['status']}，负责人 {'、'.join(names) or '无'}")
+    return [] if renamed["status"] != 304 and names == {"新管理员"} else ["修改负责人用户名"]
+
+
+def check():
+    scratchDatabase(withAsync=True)
+    seed()
+    failed = asyncio.run(checkCases()) + asyncio.run(checkRename())
+    if failed:
+        print("以下情况返回了“未变化”或过期的数据：" + "、".join(failed))
+        sys.exit(1)
+    print("条件响应检查通过！")
+
+
+if __name__ == "__main__":
+    check()
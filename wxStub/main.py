@@ -0,0 +1,57 @@
+"""
+微信API本地桩服务，用于离线压测登录流程
+用法：
+1. python wxStub/main.py（默认监听 127.0.0.1:8060，可传入端口号）
+2. config.py 中设置 WX_API_BASE = "http://127.0.0.1:8060"
+3. 对 /user/getOpenidAndSessionKey、/user/wxLogin 进行压测，openid为 "stub-openid-<tempCode>"
+"""
+import asyncio
+import sys
+import uuid
+
+from aiohttp import web
+
+# 模拟微信接口耗时（秒）
+LATENCY = 0.05
+tokenRequests = 0
+
+
+async def token(request):
+    global tokenRequests
+    tokenRequests += 1
+    await asyncio.sleep(LATENCY)
+    return web.json_response({"access_token": uuid.uuid4().hex, "expires_in": 7200})
+
+
+async def jscode2session(request):
+    await asyncio.sleep(LATENCY)
+    jsCode = request.query.get("js_code")
+    if not jsCode:
+        return web.json_response({"errcode": 40029, "errmsg": "invalid code"})
+    return web.json_response({"openid": f"stub-openid-{jsCode}", "session_key": uuid.uuid4().hex})
+
+
+async def checksession(request):
+    await asyncio.sleep(LATENCY)
+    if not request.query.get("access_token"):
+        return web.json_response({"errcode": 40001, "errmsg": "invalid credential"})
+    return web.json_response({"errcode": 0, "errmsg": "ok"})
+
+
+# 查看access_token被获取的次数，验证缓存是否生效
+async def stats(request):
+    return web.json_response({"tokenRequests": tokenRequests})
+
+
+def createApp():
+    app = web.Application()
+    app.router.add_get("/cgi-bin/token", token)
+    app.router.add_get("/sns/jscode2session", jscode2session)
+    app.router.add_get("/wxa/checksession", checksession)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8060
+    web.run_app(createApp(), host="127.0.0.1", port=port)